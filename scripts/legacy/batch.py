@@ -0,0 +1,163 @@
+import heapq
+import json
+import os
+import tempfile
+from contextlib import ExitStack
+
+from lyir import (
+    add_game,
+    iter_games,
+    merge_stats,
+    new_stats,
+    stats_from_dict,
+    stats_to_dict,
+)
+
+# Accumulators kept in memory before they are spilled to disk
+DEFAULT_MAX_USERS = 10000
+
+# Spill files open at once while merging, more are merged in rounds first
+MERGE_FAN_IN = 64
+
+
+class BatchAnalyzer:
+    """
+    Analyze the games of many players in a single pass. Every game is added
+    to the stats of both its players. When more than max_users players have
+    stats in memory, all of them are written to a spill file sorted by name
+    and dropped; results merges the spill files by name, so only one player's
+    stats are rebuilt at a time, their partial stats joined in game order.
+    - usernames: Players to analyze, None for every player
+    - max_users: Number of in-memory accumulators before spilling
+    - spill_dir: Directory for the spill files (default: system temp dir)
+    """
+
+    def __init__(self, usernames=None, max_users=DEFAULT_MAX_USERS, spill_dir=None):
+        self.usernames = set(usernames) if usernames is not None else None
+        self.max_users = max_users
+        self.spill_dir = spill_dir
+        self.accumulators = {}
+        self._spill = None
+        self._runs = []  # Paths of the spill files, in the order written
+        self._written = 0
+
+    def add_game(self, game):
+        white_player, black_player = game.headers["White"], game.headers["Black"]
+        players = (white_player,) if white_player == black_player else (
+            white_player,
+            black_player,
+        )
+        for player in players:
+            if self.usernames is None:
+                if player in ("", "?"):
+                    continue  # Missing player names
+            elif player not in self.usernames:
+                continue
+            stats = self.accumulators.get(player)
+            if stats is None:
+                if len(self.accumulators) >= self.max_users:
+                    self.spill()
+                stats = self.accumulators[player] = new_stats()
+            add_game(stats, game, player)
+
+    def spill(self):
+        if self._spill is None:
+            self._spill = tempfile.TemporaryDirectory(
+                prefix="lyir-batch-", dir=self.spill_dir
+            )
+        # One line per player, the JSON-encoded name and their stats split by a
+        # tab, which json.dumps never writes unescaped
+        path = self._new_run()
+        with open(path, "w") as file:
+            for username in sorted(self.accumulators):
+                stats = stats_to_dict(self.accumulators[username])
+                file.write(
+                    f"{json.dumps(username)}\t"
+                    f"{json.dumps(stats, separators=(',', ':'))}\n"
+                )
+        self._runs.append(path)
+        self.accumulators = {}
+
+    def _new_run(self):
+        path = os.path.join(self._spill.name, f"run-{self._written:04d}.jsonl")
+        self._written += 1
+        return path
+
+    def _read_run(self, file):
+        # (username, line) of a spill file, the stats decoded when used
+        for line in file:
+            username, _, _ = line.partition("\t")
+            yield json.loads(username), line
+
+    def _merge(self, paths, files):
+        # (username, line) of spill files by name, heapq.merge keeps the order
+        # of the files for equal names: game order
+        runs = [self._read_run(files.enter_context(open(path))) for path in paths]
+        return heapq.merge(*runs, key=lambda entry: entry[0])
+
+    def _merge_rounds(self):
+        # Merge groups of MERGE_FAN_IN spill files into one, in order, until
+        # few enough are left to be opened at once
+        runs = self._runs
+        while len(runs) > MERGE_FAN_IN:
+            merged = []
+            for start in range(0, len(runs), MERGE_FAN_IN):
+                group = runs[start : start + MERGE_FAN_IN]
+                path = self._new_run()
+                with ExitStack() as files, open(path, "w") as output:
+                    for _, line in self._merge(group, files):
+                        output.write(line)
+                for run in group:
+                    os.remove(run)
+                merged.append(path)
+            runs = merged
+        return runs
+
+    def results(self):
+        """
+        Generator over (username, stats) once every game has been added.
+        After spilling, players come out sorted by name.
+        """
+        if self._spill is None:
+            yield from self.accumulators.items()
+            self.accumulators = {}
+            return
+
+        self.spill()
+        try:
+            with ExitStack() as files:
+                current, merged = None, None
+                for username, line in self._merge(self._merge_rounds(), files):
+                    stats = stats_from_dict(json.loads(line.partition("\t")[2]))
+                    if username == current:
+                        merge_stats(merged, stats)
+                        continue
+                    if current is not None:
+                        yield current, merged
+                    current, merged = username, stats
+                if current is not None:
+                    yield current, merged
+        finally:
+            self._spill.cleanup()
+            self._spill = None
+            self._runs = []
+            self._written = 0
+
+
+def analyze_batch(file_path, output_path, usernames=None, **options):
+    """
+    Analyze a PGN file for a set of players (None for all of them) in one
+    read, writing one JSON line per player to output_path.
+    Returns the number of players written.
+    """
+    analyzer = BatchAnalyzer(usernames, **options)
+    for game in iter_games(file_path, fast=True):
+        analyzer.add_game(game)
+
+    count = 0
+    with open(output_path, "w") as output:
+        for username, stats in analyzer.results():
+            entry = {"username": username, "stats": stats_to_dict(stats)}
+            output.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            count += 1
+    return count
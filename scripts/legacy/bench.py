@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import lyir
+from downsample import downsample
+from export import export_summary, load_summary
+from headless import display_quietly
+from synthetic import DEFAULT_USERNAME, write_pgn
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_DATA_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "lyir", "bench"
+)
+
+# Relative throughput drop against the baseline that counts as a regression
+DEFAULT_TOLERANCE = 0.10
+
+
+def dataset(data_dir, size, seed):
+    # Synthetic PGN files are generated once and reused between runs
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic-{size}-{seed}.pgn")
+    if not os.path.exists(path):
+        temporary = path + ".tmp"
+        write_pgn(temporary, size, seed)
+        os.replace(temporary, path)
+    return path
+
+
+def _rating_progression(games):
+    for game_type_number in lyir.GAME_TYPE_MAP:
+        lyir.get_rating_progression(games, DEFAULT_USERNAME, game_type_number)
+
+
+def _rating_series(stats):
+    for game_type in lyir.GAME_TYPE_MAP.values():
+        dates, ratings = stats["ratings"].series(game_type)
+        downsample(dates, ratings, lyir.DEFAULT_MAX_POINTS)
+
+
+def _exported(path):
+    # Summary of a dataset next to it, written once outside the measurement
+    stats = lyir.analyze_games(lyir.iter_games(path, fast=True), DEFAULT_USERNAME)
+    export_summary(stats, _summary_path(path), DEFAULT_USERNAME)
+    return _summary_path(path)
+
+
+def _summary_path(path):
+    return path + ".summary.json.gz"
+
+
+def stages(path):
+    """
+    (name, setup, run) for every benchmarked stage. setup prepares the input
+    outside of the measurement, run takes what setup returned.
+    """
+    return [
+        ("parse_pgn", lambda: path, lambda path: lyir.parse_pgn(path, fast=True)),
+        (
+            "analyze_games",
+            lambda: lyir.parse_pgn(path, compact=True),
+            lambda games: lyir.analyze_games(games, DEFAULT_USERNAME),
+        ),
+        (
+            "get_rating_progression",
+            lambda: lyir.parse_pgn(path, compact=True),
+            _rating_progression,
+        ),
+        (
+            "rating_series",
+            lambda: lyir.analyze_games(lyir.iter_games(path, fast=True), DEFAULT_USERNAME),
+            _rating_series,
+        ),
+        (
+            "display_stats",
+            lambda: lyir.analyze_games(lyir.iter_games(path, fast=True), DEFAULT_USERNAME),
+            display_quietly,
+        ),
+        # A precomputed summary against analyzing the PGN again
+        (
+            "reanalyze_pgn",
+            lambda: path,
+            lambda path: lyir.analyze_games(
+                lyir.iter_games(path, fast=True), DEFAULT_USERNAME
+            ),
+        ),
+        (
+            "export_summary",
+            lambda: lyir.analyze_games(lyir.iter_games(path, fast=True), DEFAULT_USERNAME),
+            lambda stats: export_summary(stats, _summary_path(path), DEFAULT_USERNAME),
+        ),
+        ("load_summary", lambda: _exported(path), load_summary),
+    ]
+
+
+def measure(setup, run, memory=True):
+    """
+    Wall time of run(setup()), then its peak traced Python memory in a
+    second, traced call so tracing does not skew the timing.
+    """
+    argument = setup()
+    start = time.perf_counter()
+    run(argument)
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        run(argument)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def run_benchmarks(sizes, seed=0, data_dir=DEFAULT_DATA_DIR, only=None, memory=True):
+    results = []
+    for size in sizes:
+        path = dataset(data_dir, size, seed)
+        for name, setup, run in stages(path):
+            if only and name not in only:
+                continue
+            seconds, peak = measure(setup, run, memory)
+            results.append(
+                {
+                    "stage": name,
+                    "games": size,
+                    "seconds": round(seconds, 6),
+                    "games_per_second": round(size / seconds, 1) if seconds else None,
+                    "peak_bytes": peak,
+                }
+            )
+            print(
+                f"{name:<24} {size:>9} games {seconds:>9.3f}s "
+                f"{size / seconds if seconds else 0:>12.0f} games/s"
+                + (f" {peak / 2**20:>9.1f} MiB peak" if peak is not None else ""),
+                flush=True,
+            )
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Stages whose throughput fell more than tolerance below the baseline, as
+    (stage, games, baseline games/s, current games/s).
+    """
+    previous = {
+        (entry["stage"], entry["games"]): entry["games_per_second"]
+        for entry in baseline["results"]
+    }
+    regressions = []
+    for entry in report["results"]:
+        before = previous.get((entry["stage"], entry["games"]))
+        after = entry["games_per_second"]
+        if before and after is not None and after < before * (1 - tolerance):
+            regressions.append((entry["stage"], entry["games"], before, after))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the lyir analysis pipeline")
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=DEFAULT_SIZES,
+        help="Comma-separated game counts (default: 1000,10000,100000,1000000)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--stage", action="append", help="Only run this stage")
+    parser.add_argument("--no-memory", action="store_true", help="Skip peak memory")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Compare against a previous JSON result")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    report = run_benchmarks(
+        args.sizes, args.seed, args.data_dir, args.stage, not args.no_memory
+    )
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for stage, games, before, after in regressions:
+            print(
+                f"REGRESSION {stage} at {games} games: "
+                f"{before:.0f} -> {after:.0f} games/s ({after / before - 1:+.1%})"
+            )
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,107 @@
+from datetime import date, datetime
+
+import numpy as np
+
+from lyir import (
+    DAILY_CATEGORIES,
+    DAILY_COLORS,
+    DAILY_FIELDS,
+    EPOCH_ORDINAL,
+    analyze_games,
+    iter_games,
+)
+
+
+def _day(value):
+    # Days since the epoch of a date, datetime, datetime64 or "YYYY-MM-DD"
+    if isinstance(value, (date, datetime)):
+        return value.toordinal() - EPOCH_ORDINAL
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+
+class DateCube:
+    """
+    Prefix sums over the per-day buckets of stats["daily"], so the games,
+    wins, losses, draws and rating change of any date range, game type and
+    color are answered in constant time, whatever the size of the range.
+    Days without games are included as zeros, so the cube takes
+    40 * 8 bytes per day between the first and last game.
+    - stats: Dict returned by analyze_games (or merged with merge_stats)
+    """
+
+    def __init__(self, stats):
+        daily = stats["daily"]
+        self.first = min(daily) if daily else 0
+        self.last = max(daily) if daily else -1
+        shape = (len(DAILY_CATEGORIES), len(DAILY_COLORS), len(DAILY_FIELDS))
+        cells = np.zeros((self.last - self.first + 2,) + shape, dtype=np.int64)
+        for day, bucket in daily.items():
+            row = np.frombuffer(bucket, dtype=np.int32)
+            cells[day - self.first + 1] = row.reshape(shape)
+        # prefix[i] holds the totals of the days before first + i
+        self.prefix = np.cumsum(cells, axis=0)
+
+    @classmethod
+    def from_pgn(cls, file_path, username):
+        return cls(analyze_games(iter_games(file_path, fast=True), username))
+
+    @property
+    def start(self):
+        return np.datetime64(self.first, "D") if self.last >= self.first else None
+
+    @property
+    def end(self):
+        return np.datetime64(self.last, "D") if self.last >= self.first else None
+
+    def _index(self, day):
+        # Row of prefix holding the totals of the days before day
+        return min(max(day - self.first, 0), self.last - self.first + 1)
+
+    def query(self, start=None, end=None, category=None, color=None):
+        """
+        Totals of DAILY_FIELDS over the games from start to end, both
+        included, as a dict.
+        - start, end: date, datetime, numpy.datetime64 or "YYYY-MM-DD",
+          None for the first or last game
+        - category: "Bullet", "Blitz", "Rapid" or "Classical", None for all
+        - color: "White" or "Black", None for both
+        """
+        low = self._index(_day(start)) if start is not None else 0
+        high = self._index(_day(end) + 1) if end is not None else len(self.prefix) - 1
+        totals = self.prefix[max(high, low)] - self.prefix[low]
+        if category is not None:
+            totals = totals[DAILY_CATEGORIES.index(category)]
+        else:
+            totals = totals.sum(axis=0)
+        if color is not None:
+            totals = totals[DAILY_COLORS.index(color)]
+        else:
+            totals = totals.sum(axis=0)
+        return dict(zip(DAILY_FIELDS, totals.tolist()))
+
+    def last_days(self, days, **filters):
+        # The trailing window of days ending on the last game, e.g. last_days(90)
+        return self.query(
+            np.datetime64(self.last - days + 1, "D"), self.end, **filters
+        )
+
+    def months(self, category=None, color=None):
+        """
+        {"YYYY-MM": totals} for every calendar month between the first and
+        last game, unlike monthly_performance which folds the years together.
+        """
+        if self.last < self.first:
+            return {}
+        months = np.arange(
+            self.start.astype("datetime64[M]"),
+            self.end.astype("datetime64[M]") + 1,
+        )
+        return {
+            str(month): self.query(
+                month.astype("datetime64[D]"),
+                (month + 1).astype("datetime64[D]") - 1,
+                category,
+                color,
+            )
+            for month in months
+        }
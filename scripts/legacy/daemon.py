@@ -0,0 +1,391 @@
+import argparse
+import json
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from lyir import (
+    DAILY_CATEGORIES,
+    DAILY_COLORS,
+    add_game,
+    iter_games,
+    new_record,
+    new_stats,
+    stats_to_dict,
+    summary_tables,
+)
+
+DEFAULT_PORT = 8765
+
+# Memoized query results, and analyzed players whose stats are kept
+DEFAULT_CACHE_ENTRIES = 1024
+DEFAULT_CACHED_PLAYERS = 64
+
+# Seconds between checks of the source files for changes
+DEFAULT_POLL = 2.0
+
+class QueryError(Exception):
+    """
+    A query that cannot be answered, with the HTTP status to answer with.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LRUCache:
+    """
+    Thread-safe mapping keeping the max_entries most recently used values.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_or_compute(self, key, compute):
+        """
+        Cached value of key, computed outside the lock on a miss, so a slow
+        query does not hold up the others.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        value = compute()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def info(self):
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def _signature(path):
+    # Changes when a file is rewritten or appended to
+    status = os.stat(path)
+    return status.st_mtime_ns, status.st_size
+
+
+class GameStore:
+    """
+    The games of one or more PGN files as compact records, in file order,
+    with the positions of every player's games.
+    - paths: PGN files, optionally compressed, read in this order
+    """
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.signatures = {path: _signature(path) for path in self.paths}
+        self.games = []
+        self.players = {}  # username -> positions of their games
+        for path in self.paths:
+            for game in iter_games(path, compact=True):
+                position = len(self.games)
+                self.games.append(game)
+                for player in {game.white, game.black}:
+                    positions = self.players.get(player)
+                    if positions is None:
+                        positions = self.players[player] = array("i")
+                    positions.append(position)
+        self.loaded_at = time.time()
+
+    def changed(self):
+        # Whether a source file differs from when it was loaded
+        for path, signature in self.signatures.items():
+            try:
+                if _signature(path) != signature:
+                    return True
+            except FileNotFoundError:
+                return True
+        return False
+
+    def player_games(self, username):
+        positions = self.players.get(username)
+        if positions is None:
+            raise QueryError(404, f"No games of {username}")
+        games = self.games
+        return [games[position] for position in positions]
+
+
+def top_openings(stats, count=10):
+    """
+    Most played openings of analyzed stats with their records, as add_game
+    tallies them, the same numbers the summary reports.
+    """
+    success = stats["opening_success"]
+    return [
+        {"opening": opening, "games": games_played, **success[opening]}
+        for opening, games_played in stats["openings"].most_common(count)
+    ]
+
+
+class QueryEngine:
+    """
+    Answers stats queries over the games of a GameStore, analyzing each
+    player once and memoizing every answer. reload() swaps in a fresh store
+    and drops everything computed from the old one.
+    """
+
+    def __init__(
+        self,
+        paths,
+        cache_entries=DEFAULT_CACHE_ENTRIES,
+        cached_players=DEFAULT_CACHED_PLAYERS,
+    ):
+        self.paths = list(paths)
+        self.store = GameStore(self.paths)
+        self.generation = 0
+        self.results = LRUCache(cache_entries)
+        self.players = LRUCache(cached_players)
+        self.lock = threading.Lock()
+
+    def reload(self):
+        store = GameStore(self.paths)
+        with self.lock:
+            self.store = store
+            self.generation += 1
+        self.results.clear()
+        self.players.clear()
+
+    def _player(self, username, color=None):
+        """
+        (stats, cube) of a player, analyzed like analyze_games on their
+        games in file order, optionally only those played with color.
+        """
+        with self.lock:
+            store, generation = self.store, self.generation
+
+        def analyze():
+            games = store.player_games(username)
+            if color is not None:
+                games = [
+                    game
+                    for game in games
+                    if ("White" if game.white == username else "Black") == color
+                ]
+            stats = new_stats()
+            for game in games:
+                add_game(stats, game, username)
+            return stats, {}
+
+        return self.players.get_or_compute((generation, username, color), analyze)
+
+    def query(self, name, params):
+        """
+        JSON answer of a query as bytes, e.g. query("rating", {"user": "me",
+        "type": "Blitz"}). Answers are memoized encoded, so a repeated query
+        costs a lookup. Raises QueryError for unknown or invalid queries.
+        """
+        handler = getattr(self, f"_query_{name}", None)
+        if handler is None:
+            raise QueryError(404, f"Unknown query: {name}")
+        with self.lock:
+            key = (self.generation, name, tuple(sorted(params.items())))
+        return self.results.get_or_compute(
+            key, lambda: json.dumps(handler(params)).encode()
+        )
+
+    def _user(self, params):
+        username = params.get("user")
+        if not username:
+            raise QueryError(400, "Missing user")
+        return username
+
+    def _query_stats(self, params):
+        stats, _ = self._player(self._user(params))
+        return stats_to_dict(stats)
+
+    def _query_summary(self, params):
+        stats, _ = self._player(self._user(params))
+        return summary_tables(stats)
+
+    def _query_rating(self, params):
+        from downsample import downsample
+
+        stats, _ = self._player(self._user(params))
+        game_type = params.get("type", "Blitz")
+        if game_type not in DAILY_CATEGORIES:
+            raise QueryError(400, f"Unknown game type: {game_type}")
+        dates, ratings = stats["ratings"].series(game_type)
+        points = int(params.get("points", 0))
+        if points and len(dates) > points:
+            dates, ratings = downsample(
+                dates, ratings, points, params.get("method", "lttb")
+            )
+        return {
+            "type": game_type,
+            "dates": [str(date) for date in dates],
+            "ratings": ratings.tolist(),
+        }
+
+    def _query_head_to_head(self, params):
+        stats, _ = self._player(self._user(params))
+        opponent = params.get("opponent")
+        if opponent:
+            record = stats["head_to_head"].get(opponent, new_record())
+            return dict(record, opponent=opponent, games=sum(record.values()))
+        opponents = sorted(
+            stats["head_to_head"].items(),
+            key=lambda item: sum(item[1].values()),
+            reverse=True,
+        )
+        return [
+            dict(record, opponent=name, games=sum(record.values()))
+            for name, record in opponents[: int(params.get("n", 10))]
+        ]
+
+    def _query_openings(self, params):
+        username = self._user(params)
+        color = params.get("color")
+        if color is not None and color not in DAILY_COLORS:
+            raise QueryError(400, f"Unknown color: {color}")
+        stats, _ = self._player(username, color)
+        return top_openings(stats, int(params.get("n", 10)))
+
+    def _query_range(self, params):
+        from cube import DateCube
+
+        stats, built = self._player(self._user(params))
+        if params.get("type") not in (None,) + DAILY_CATEGORIES:
+            raise QueryError(400, f"Unknown game type: {params['type']}")
+        if params.get("color") not in (None,) + DAILY_COLORS:
+            raise QueryError(400, f"Unknown color: {params['color']}")
+        # Built on the first range query of the player, kept with their stats
+        if "cube" not in built:
+            built["cube"] = DateCube(stats)
+        return built["cube"].query(
+            params.get("start"),
+            params.get("end"),
+            params.get("type"),
+            params.get("color"),
+        )
+
+    def _query_status(self, params):
+        store = self.store
+        return {
+            "sources": store.paths,
+            "games": len(store.games),
+            "players": len(store.players),
+            "loaded_at": store.loaded_at,
+            "generation": self.generation,
+            "results": self.results.info(),
+            "analyzed_players": self.players.info(),
+        }
+
+    def watch(self, interval=DEFAULT_POLL):
+        """
+        Reload in a background thread whenever a source file changes.
+        """
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                if self.store.changed():
+                    try:
+                        self.reload()
+                    except (OSError, ValueError):
+                        # Caught mid-write, try again on the next poll
+                        pass
+
+        thread = threading.Thread(target=poll, daemon=True)
+        thread.start()
+        return thread
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    # GET /<query>?user=...&..., answered with JSON
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        # Status queries are not memoized, their answer changes all the time
+        if url.path.strip("/") == "status":
+            status = self.server.engine._query_status(params)
+            return self._send(200, json.dumps(status).encode())
+        try:
+            self._send(200, self.server.engine.query(url.path.strip("/"), params))
+        except QueryError as error:
+            self._send(error.status, json.dumps({"error": str(error)}).encode())
+        except ValueError as error:
+            # Numbers or dates that do not parse
+            self._send(400, json.dumps({"error": str(error)}).encode())
+
+
+def serve(engine, port=DEFAULT_PORT, host="127.0.0.1"):
+    """
+    HTTP server answering the queries of an engine, call serve_forever().
+    Port 0 picks a free port.
+    """
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    server.engine = engine
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Keep PGN archives in memory and answer stats queries over HTTP"
+    )
+    parser.add_argument("pgn_files", nargs="+")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL)
+    parser.add_argument("--cache-entries", type=int, default=DEFAULT_CACHE_ENTRIES)
+    parser.add_argument("--cached-players", type=int, default=DEFAULT_CACHED_PLAYERS)
+    parser.add_argument(
+        "--warm", action="append", default=[], help="Analyze this player at startup"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    engine = QueryEngine(args.pgn_files, args.cache_entries, args.cached_players)
+    for username in args.warm:
+        engine.query("summary", {"user": username})
+    engine.watch(args.poll)
+    server = serve(engine, args.port, args.host)
+    print(
+        f"{len(engine.store.games)} games loaded in "
+        f"{time.perf_counter() - start:.2f}s, listening on "
+        f"http://{args.host}:{server.server_address[1]}/"
+        "{status,stats,summary,rating,head_to_head,openings,range}"
+    )
+    server.serve_forever()
@@ -0,0 +1,236 @@
+import bz2
+import gzip
+import io
+import mmap
+import os
+import re
+from collections import deque
+
+GZIP_MAGIC = b"\x1f\x8b"
+BZ2_MAGIC = b"BZh"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+EXTENSIONS = {".gz": "gzip", ".bz2": "bz2", ".zst": "zstd", ".zstd": "zstd"}
+
+# A bz2 stream starts with its header followed by the first block magic
+BZ2_STREAM_REGEX = re.compile(rb"BZh[1-9]1AY&SY")
+
+# Compressed size of the pieces handed to the decompression threads, and the
+# largest single stream or frame decompressed in one go
+TARGET_CHUNK_BYTES = 8 << 20
+MAX_CHUNK_BYTES = 64 << 20
+
+
+def detect_format(file_path):
+    """
+    Compression of a file, from its magic bytes and then its extension:
+    "gzip", "bz2", "zstd", or None for plain text.
+    """
+    with open(file_path, "rb") as file:
+        head = file.read(4)
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(BZ2_MAGIC):
+        return "bz2"
+    if head == ZSTD_MAGIC or _is_skippable(head):
+        return "zstd"
+    return EXTENSIONS.get(os.path.splitext(file_path)[1].lower())
+
+
+def _is_skippable(head):
+    # zstd skippable frames, as written by pzstd, use magics 0x184D2A50-5F
+    return len(head) == 4 and head[1:] == b"\x2a\x4d\x18" and head[0] & 0xF0 == 0x50
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            "Reading .zst files needs the zstandard package: pip install zstandard"
+        ) from None
+    return zstandard
+
+
+class ChunkReader(io.RawIOBase):
+    # Raw binary stream over an iterator of bytes chunks
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._chunk = memoryview(b"")
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while self._position == len(self._chunk):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._chunk = memoryview(chunk)
+            self._position = 0
+        size = min(len(target), len(self._chunk) - self._position)
+        target[:size] = self._chunk[self._position : self._position + size]
+        self._position += size
+        return size
+
+    def close(self):
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+        super().close()
+
+
+def _ordered_map(function, tasks, workers):
+    # Like ThreadPoolExecutor.map, but with a bounded number of pending results
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(function, task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _group(boundaries, size):
+    # Merge consecutive [start, end) pieces into chunks of about TARGET_CHUNK_BYTES
+    chunks = []
+    start = 0
+    for boundary in boundaries[1:] + [size]:
+        if boundary - start >= TARGET_CHUNK_BYTES or boundary == size:
+            chunks.append((start, boundary))
+            start = boundary
+    return chunks
+
+
+def bz2_streams(data):
+    """
+    Start offsets of the concatenated streams of a bz2 file, as written by
+    pbzip2 or lbzip2. None when a stream is too large to decompress at once.
+    """
+    starts = [match.start() for match in BZ2_STREAM_REGEX.finditer(data)]
+    if not starts or starts[0] != 0:
+        return None
+    ends = starts[1:] + [len(data)]
+    if max(end - start for start, end in zip(starts, ends)) > MAX_CHUNK_BYTES:
+        return None
+    return starts
+
+
+def zstd_frames(data):
+    """
+    Start offsets of the frames of a zstd file, found by walking the frame
+    and block headers without decompressing anything. Skippable frames are
+    stepped over. None when a frame is too large to decompress at once or
+    the layout is not understood.
+    """
+    starts = []
+    position = 0
+    size = len(data)
+    while position < size:
+        magic = data[position : position + 4]
+        if _is_skippable(magic):
+            length = int.from_bytes(data[position + 4 : position + 8], "little")
+            position += 8 + length
+            continue
+        if magic != ZSTD_MAGIC:
+            return None
+
+        start = position
+        descriptor = data[position + 4]
+        content_size_flag = descriptor >> 6
+        single_segment = (descriptor >> 5) & 1
+        has_checksum = (descriptor >> 2) & 1
+        dictionary_id_flag = descriptor & 3
+        position += 5
+        position += 0 if single_segment else 1  # Window descriptor
+        position += (0, 1, 2, 4)[dictionary_id_flag]
+        position += (1 if single_segment else 0, 2, 4, 8)[content_size_flag]
+
+        while True:
+            header = int.from_bytes(data[position : position + 3], "little")
+            position += 3
+            block_type = (header >> 1) & 3
+            if block_type == 3:
+                return None  # Reserved block type
+            position += 1 if block_type == 1 else header >> 3
+            if header & 1:
+                break
+        position += 4 if has_checksum else 0
+
+        if position > size or position - start > MAX_CHUNK_BYTES:
+            return None
+        starts.append(start)
+    return starts
+
+
+def _decompress_bz2(chunk):
+    return bz2.decompress(chunk)
+
+
+def _decompress_zstd(chunk):
+    # One frame at a time, decompressobj handles frames without a content size
+    zstandard = _zstandard()
+    output = []
+    while chunk:
+        if _is_skippable(chunk[:4]):
+            chunk = chunk[8 + int.from_bytes(chunk[4:8], "little") :]
+            continue
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        output.append(decompressor.decompress(chunk))
+        chunk = decompressor.unused_data
+    return b"".join(output)
+
+
+def _parallel_chunks(file_path, boundaries, function, workers):
+    with open(file_path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            chunks = _group(boundaries, len(mapped))
+            tasks = (mapped[start:end] for start, end in chunks)
+            yield from _ordered_map(function, tasks, workers)
+        finally:
+            mapped.close()
+
+
+def open_binary(file_path, compression, workers=None):
+    """
+    Binary stream of the decompressed content of a file. bz2 files with
+    several streams and zstd files with several frames are decompressed by
+    a pool of threads, other files are decompressed sequentially.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    if compression == "gzip":
+        return gzip.open(file_path, "rb")
+
+    if compression == "bz2":
+        boundaries = None
+        if workers > 1 and os.path.getsize(file_path):
+            with open(file_path, "rb") as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    boundaries = bz2_streams(data)
+        if boundaries is None or len(boundaries) == 1:
+            return bz2.open(file_path, "rb")
+        chunks = _parallel_chunks(file_path, boundaries, _decompress_bz2, workers)
+        return io.BufferedReader(ChunkReader(chunks))
+
+    if compression == "zstd":
+        zstandard = _zstandard()
+        boundaries = None
+        if workers > 1 and os.path.getsize(file_path):
+            with open(file_path, "rb") as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    boundaries = zstd_frames(data)
+        if boundaries is None or len(boundaries) == 1:
+            return zstandard.ZstdDecompressor().stream_reader(
+                open(file_path, "rb"), read_across_frames=True, closefd=True
+            )
+        chunks = _parallel_chunks(file_path, boundaries, _decompress_zstd, workers)
+        return io.BufferedReader(ChunkReader(chunks))
+
+    raise ValueError(f"Unsupported compression: {compression}")
@@ -0,0 +1,86 @@
+import numpy as np
+
+
+def _numeric(x):
+    # Dates downsample on their day number
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[D]").astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb(x, y, threshold):
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets, which picks
+    the point of each bucket forming the largest triangle with the previous
+    pick and the average of the next bucket. Keeps the first and last point.
+    - x: Sorted x values (numbers or datetime64)
+    - y: Values at x
+    - threshold: Number of points to keep, 3 or more
+    """
+    if threshold < 3:
+        raise ValueError(f"lttb keeps at least 3 points, not {threshold}")
+    size = len(y)
+    if threshold >= size:
+        return np.arange(size)
+
+    x = _numeric(x)
+    y = np.asarray(y, dtype=np.float64)
+    every = (size - 2) / (threshold - 2)
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0] = 0
+    picked[-1] = size - 1
+    previous = 0
+
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, size)
+        average_x = x[end:next_end].mean()
+        average_y = y[end:next_end].mean()
+
+        # Twice the triangle areas, enough to compare them
+        areas = np.abs(
+            (x[previous] - average_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (average_y - y[previous])
+        )
+        previous = start + int(areas.argmax())
+        picked[bucket + 1] = previous
+    return picked
+
+
+def minmax(y, threshold):
+    """
+    Indices of the lowest and highest point of (threshold - 2) // 2 equal
+    buckets plus the first and last point, in order and at most threshold of
+    them. Cheaper than lttb and never drops a peak or a dip.
+    - y: Values, in x order
+    - threshold: Most points to keep, 4 or more
+    """
+    if threshold < 4:
+        raise ValueError(f"minmax keeps at least 4 points, not {threshold}")
+    size = len(y)
+    if threshold >= size:
+        return np.arange(size)
+
+    y = np.asarray(y)
+    edges = np.linspace(0, size, (threshold - 2) // 2 + 1).astype(np.int64)
+    picked = [0, size - 1]
+    for start, end in zip(edges[:-1].tolist(), edges[1:].tolist()):
+        chunk = y[start:end]
+        picked.append(start + int(chunk.argmin()))
+        picked.append(start + int(chunk.argmax()))
+    return np.unique(picked)
+
+
+def downsample(x, y, threshold, method="lttb"):
+    """
+    (x, y) reduced to at most threshold points with lttb or minmax.
+    """
+    if method == "lttb":
+        picked = lttb(x, y, threshold)
+    elif method == "minmax":
+        picked = minmax(y, threshold)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    return np.asarray(x)[picked], np.asarray(y)[picked]
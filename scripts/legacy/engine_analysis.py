@@ -0,0 +1,389 @@
+import argparse
+import json
+import math
+import os
+import queue
+import shlex
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import chess
+import chess.engine
+import chess.polyglot
+
+from lyir import iter_games
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "lyir",
+    "evaluations.sqlite",
+)
+
+DEFAULT_DEPTH = 12
+
+# Games whose new positions are collected and evaluated together, positions
+# repeated inside a batch go to the engines once
+BATCH_GAMES = 64
+
+# Centipawn score standing for a forced mate, the win chance saturates long before
+MATE_SCORE = 100000
+
+# Drop of the mover's win chance (percentage points) counted as each mistake
+# kind, the thresholds Lichess uses
+INACCURACY = 5
+MISTAKE = 10
+BLUNDER = 15
+
+
+def win_percent(centipawns):
+    # Lichess win chance (0-100) of a White-relative score
+    return 50 + 50 * (2 / (1 + math.exp(-0.00368208 * centipawns)) - 1)
+
+
+def move_accuracy(before, after):
+    # Lichess accuracy (0-100) of a move from the mover's win chance before and after
+    accuracy = 103.1668 * math.exp(-0.04354 * (before - after)) - 3.1669
+    return min(max(accuracy, 0), 100)
+
+
+def limit_key(limit):
+    # Evaluations are only reused for the same engine limit
+    return ",".join(
+        f"{name}={value}"
+        for name, value in (
+            ("depth", limit.depth),
+            ("nodes", limit.nodes),
+            ("time", limit.time),
+        )
+        if value is not None
+    )
+
+
+def _signed(key):
+    # SQLite integers are signed 64-bit, Zobrist hashes unsigned
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+class EvaluationCache:
+    """
+    Persistent White-relative centipawn scores of positions in SQLite, keyed
+    by Zobrist hash, engine name and limit, so positions shared by many
+    games (openings above all) are evaluated once across runs.
+    - cache_path: Path to the SQLite database, None for memory only
+    """
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH):
+        if cache_path is None:
+            cache_path = ":memory:"
+        else:
+            directory = os.path.dirname(cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS evaluations (
+                zobrist INTEGER NOT NULL,
+                engine TEXT NOT NULL,
+                limits TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                PRIMARY KEY (zobrist, engine, limits)
+            )
+            """
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def get_many(self, keys, engine, limits):
+        """
+        {zobrist: score} for the keys already evaluated.
+        """
+        found = {}
+        keys = list(keys)
+        # Stay under SQLite's limit on bound parameters
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                "SELECT zobrist, score FROM evaluations"
+                f" WHERE engine = ? AND limits = ? AND zobrist IN ({placeholders})",
+                [engine, limits] + [_signed(key) for key in chunk],
+            )
+            for zobrist, score in rows:
+                found[zobrist % (1 << 64)] = score
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, scores, engine, limits):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?, ?)",
+                [
+                    (_signed(key), engine, limits, score)
+                    for key, score in scores.items()
+                ],
+            )
+
+
+class EnginePool:
+    """
+    A set of UCI engine processes, each used by one thread at a time, so
+    positions are evaluated on as many cores as there are engines.
+    - command: Engine command line, as a list or a shell-style string
+    - workers: Number of engine processes (default: CPU count)
+    - limit: chess.engine.Limit for every evaluation
+    - options: UCI options set on every engine, e.g. {"Hash": 64}
+    """
+
+    def __init__(self, command, workers=None, limit=None, options=None):
+        if isinstance(command, str):
+            command = shlex.split(command)
+        self.limit = limit or chess.engine.Limit(depth=DEFAULT_DEPTH)
+        self.workers = workers or os.cpu_count() or 1
+        self.engines = queue.Queue()
+        self._all = []
+        try:
+            for _ in range(self.workers):
+                engine = chess.engine.SimpleEngine.popen_uci(command)
+                self._all.append(engine)
+                if options:
+                    engine.configure(options)
+                self.engines.put(engine)
+        except Exception:
+            self.close()
+            raise
+        self.name = self._all[0].id.get("name", command[0])
+        self._threads = ThreadPoolExecutor(max_workers=self.workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if getattr(self, "_threads", None) is not None:
+            self._threads.shutdown()
+        for engine in self._all:
+            engine.quit()
+        self._all = []
+
+    def _evaluate(self, fen):
+        engine = self.engines.get()
+        try:
+            info = engine.analyse(chess.Board(fen), self.limit)
+        finally:
+            self.engines.put(engine)
+        return info["score"].white().score(mate_score=MATE_SCORE)
+
+    def evaluate(self, fens):
+        """
+        White-relative centipawn scores of positions given as FENs, in order.
+        """
+        return list(self._threads.map(self._evaluate, fens))
+
+
+def terminal_score(board):
+    # Score of a finished position without asking an engine, None otherwise
+    if board.is_checkmate():
+        return -MATE_SCORE if board.turn == chess.WHITE else MATE_SCORE
+    if board.is_stalemate() or board.is_insufficient_material():
+        return 0
+    return None
+
+
+def game_positions(game):
+    """
+    (zobrist, fen, terminal score or None) of every mainline position,
+    starting with the initial one.
+    """
+    board = game.board()
+    positions = []
+    for move in [None] + list(game.mainline_moves()):
+        if move is not None:
+            board.push(move)
+        positions.append(
+            (chess.polyglot.zobrist_hash(board), board.fen(), terminal_score(board))
+        )
+    return positions
+
+
+def game_accuracy(game, scores, username):
+    """
+    Accuracy of both sides and mistakes of the user's moves, from the scores
+    of the game's positions (White-relative, in mainline order).
+    """
+    white = game.headers.get("White")
+    black = game.headers.get("Black")
+    accuracies = {chess.WHITE: [], chess.BLACK: []}
+    counts = {
+        chess.WHITE: {"inaccuracies": 0, "mistakes": 0, "blunders": 0},
+        chess.BLACK: {"inaccuracies": 0, "mistakes": 0, "blunders": 0},
+    }
+    turn = game.board().turn
+    for before, after in zip(scores, scores[1:]):
+        sign = 1 if turn == chess.WHITE else -1
+        win_before, win_after = win_percent(sign * before), win_percent(sign * after)
+        accuracies[turn].append(move_accuracy(win_before, win_after))
+        drop = win_before - win_after
+        if drop >= BLUNDER:
+            counts[turn]["blunders"] += 1
+        elif drop >= MISTAKE:
+            counts[turn]["mistakes"] += 1
+        elif drop >= INACCURACY:
+            counts[turn]["inaccuracies"] += 1
+        turn = not turn
+
+    def mean(values):
+        return round(sum(values) / len(values), 1) if values else None
+
+    result = {
+        "white": white,
+        "black": black,
+        "date": game.headers.get("Date"),
+        "site": game.headers.get("Site"),
+        "white_accuracy": mean(accuracies[chess.WHITE]),
+        "black_accuracy": mean(accuracies[chess.BLACK]),
+    }
+    if username in (white, black):
+        user_color = chess.WHITE if white == username else chess.BLACK
+        result["accuracy"] = mean(accuracies[user_color])
+        result.update(counts[user_color])
+    return result
+
+
+def analyze_accuracy(games, username, pool, cache, batch_games=BATCH_GAMES):
+    """
+    Generator over the accuracy of every game (see game_accuracy), evaluating
+    each position that is neither terminal nor in the cache exactly once.
+    - games: Iterable of chess.pgn.Game (with moves, not ScannedGame)
+    - pool: EnginePool
+    - cache: EvaluationCache
+    """
+    limits = limit_key(pool.limit)
+    batch = []
+    for game in games:
+        batch.append((game, game_positions(game)))
+        if len(batch) >= batch_games:
+            yield from _analyze_batch(batch, username, pool, cache, limits)
+            batch = []
+    if batch:
+        yield from _analyze_batch(batch, username, pool, cache, limits)
+
+
+def _analyze_batch(batch, username, pool, cache, limits):
+    scores = {}
+    wanted = {}
+    for _, positions in batch:
+        for zobrist, fen, terminal in positions:
+            if terminal is not None:
+                scores[zobrist] = terminal
+            elif zobrist not in scores:
+                wanted[zobrist] = fen
+
+    scores.update(cache.get_many(wanted, pool.name, limits))
+    missing = [zobrist for zobrist in wanted if zobrist not in scores]
+    if missing:
+        evaluated = dict(zip(missing, pool.evaluate([wanted[key] for key in missing])))
+        cache.put_many(evaluated, pool.name, limits)
+        scores.update(evaluated)
+
+    for game, positions in batch:
+        game_scores = [scores[zobrist] for zobrist, _, _ in positions]
+        yield game_accuracy(game, game_scores, username)
+
+
+def summarize(results):
+    """
+    Average accuracy and total mistakes of the user over analyzed games.
+    """
+    accuracies = [
+        result["accuracy"]
+        for result in results
+        if result.get("accuracy") is not None
+    ]
+    summary = {
+        "games": len(accuracies),
+        "accuracy": round(sum(accuracies) / len(accuracies), 1) if accuracies else None,
+    }
+    for kind in ("inaccuracies", "mistakes", "blunders"):
+        summary[kind] = sum(result.get(kind, 0) for result in results)
+    return summary
+
+
+def run(
+    file_path,
+    username,
+    command,
+    limit=None,
+    workers=None,
+    cache_path=DEFAULT_CACHE_PATH,
+    output=None,
+):
+    """
+    Analyze the accuracy of every game of a PGN file. Writes one JSON line
+    per game to output when given, and returns the summary.
+    """
+    results = []
+    pool = EnginePool(command, workers, limit)
+    with pool, EvaluationCache(cache_path) as cache:
+        for result in analyze_accuracy(iter_games(file_path), username, pool, cache):
+            results.append(result)
+            if output is not None:
+                output.write(json.dumps(result) + "\n")
+        summary = summarize(results)
+        summary["cache_hits"] = cache.hits
+        summary["evaluated"] = cache.misses
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Engine accuracy analysis of a PGN export"
+    )
+    parser.add_argument("pgn_file")
+    parser.add_argument("username")
+    parser.add_argument("--engine", default="stockfish", help="UCI engine command")
+    parser.add_argument(
+        "--depth", type=int, help=f"Search depth (default: {DEFAULT_DEPTH})"
+    )
+    parser.add_argument("--nodes", type=int, help="Node limit per position")
+    parser.add_argument(
+        "--workers", type=int, help="Engine processes (default: CPU count)"
+    )
+    parser.add_argument(
+        "--cache", default=DEFAULT_CACHE_PATH, help="Evaluation cache database"
+    )
+    parser.add_argument("--games", help="Write per-game results as JSON lines here")
+    args = parser.parse_args()
+
+    if args.depth is None and args.nodes is None:
+        args.depth = DEFAULT_DEPTH
+    limit = chess.engine.Limit(depth=args.depth, nodes=args.nodes)
+    output = open(args.games, "w") if args.games else None
+    try:
+        summary = run(
+            args.pgn_file,
+            args.username,
+            args.engine,
+            limit,
+            args.workers,
+            args.cache,
+            output,
+        )
+    finally:
+        if output is not None:
+            output.close()
+    json.dump(summary, sys.stdout, indent=2)
+    print()
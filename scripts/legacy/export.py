@@ -0,0 +1,118 @@
+import argparse
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from lyir import (
+    DEFAULT_MAX_POINTS,
+    GAME_TYPE_MAP,
+    analyze_games,
+    iter_games,
+    stats_from_dict,
+    stats_to_dict,
+)
+
+SUMMARY_FORMAT = "lyir-summary"
+
+# Bump when the layout changes, readers refuse other versions
+SUMMARY_VERSION = 2
+
+
+def rating_series(stats, max_points=DEFAULT_MAX_POINTS, method="lttb"):
+    """
+    {game type: {"days": [...], "ratings": [...]}} of the rating progression
+    downsampled to max_points like the charts, days counted from 1970-01-01.
+    """
+    from downsample import downsample
+
+    series = {}
+    for game_type in GAME_TYPE_MAP.values():
+        dates, ratings = stats["ratings"].series(game_type)
+        if max_points and len(dates) > max_points:
+            dates, ratings = downsample(dates, ratings, max_points, method)
+        series[game_type] = {
+            "days": dates.astype(np.int64).tolist(),
+            "ratings": ratings.tolist(),
+        }
+    return series
+
+
+def build_summary(stats, username=None, max_points=DEFAULT_MAX_POINTS):
+    """
+    The export document: the full stats as stats_to_dict writes them and the
+    downsampled rating series, under a format name and version.
+    """
+    return {
+        "format": SUMMARY_FORMAT,
+        "version": SUMMARY_VERSION,
+        "username": username,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "max_points": max_points,
+        "stats": stats_to_dict(stats),
+        "series": rating_series(stats, max_points),
+    }
+
+
+def export_summary(stats, path, username=None, max_points=DEFAULT_MAX_POINTS):
+    """
+    Write the summary of an analysis as gzip-compressed JSON, replacing path
+    atomically so a reader never sees half a file. Returns the bytes written.
+    """
+    document = build_summary(stats, username, max_points)
+    data = json.dumps(document, separators=(",", ":")).encode()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    # mtime=0 so the same stats always give the same bytes
+    with open(temporary, "wb") as file:
+        with gzip.GzipFile(
+            fileobj=file, mode="wb", compresslevel=6, mtime=0
+        ) as compressed:
+            compressed.write(data)
+    os.replace(temporary, path)
+    return os.path.getsize(path)
+
+
+def read_summary(path):
+    """
+    The export document of a summary file, as written by build_summary.
+    Raises ValueError for files of another format or version.
+    """
+    with gzip.open(path, "rb") as file:
+        document = json.loads(file.read())
+    if not isinstance(document, dict) or document.get("format") != SUMMARY_FORMAT:
+        raise ValueError(f"{path} is not a lyir summary")
+    if document.get("version") != SUMMARY_VERSION:
+        raise ValueError(
+            f"{path} has summary version {document.get('version')}, "
+            f"expected {SUMMARY_VERSION}"
+        )
+    return document
+
+
+def load_summary(path):
+    """
+    (stats, series) of a summary file, the stats as analyze_games returns
+    them, so they can be displayed or merged without the PGN.
+    """
+    document = read_summary(path)
+    return stats_from_dict(document["stats"]), document["series"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the analysis of a PGN file as a compact summary"
+    )
+    parser.add_argument("pgn_file")
+    parser.add_argument("username")
+    parser.add_argument("output", help="Summary file, e.g. username.summary.json.gz")
+    parser.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS)
+    args = parser.parse_args()
+
+    stats = analyze_games(iter_games(args.pgn_file, fast=True), args.username)
+    size = export_summary(stats, args.output, args.username, args.max_points)
+    print(f"Saved {args.output} ({size} bytes)")
@@ -0,0 +1,206 @@
+# Stand-in for the Lichess game export endpoint, serving the games of a PGN
+# file, for trying and timing fetch.py without touching lichess.org:
+#   python fake_lichess.py export.pgn --port 8080 --games-per-second 200
+#   python fetch.py username --base-url http://127.0.0.1:8080 --backoff 1
+import argparse
+import json
+import threading
+import time
+from calendar import timegm
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from lyir import TAG_REGEX
+
+
+def load_games(file_path):
+    """
+    (createdAt, white, black, pgn) of every game of a PGN file. Games
+    without UTCDate and UTCTime get them from Date, a second apart in file
+    order, and the tags are added to their PGN like Lichess has them.
+    """
+    games = []
+    lines = []
+    with open(file_path, "r") as file:
+        for line in file:
+            starts = line.startswith("[Event ")
+            if starts and any(not text.isspace() for text in lines):
+                games.append(lines)
+                lines = []
+            lines.append(line)
+    if any(not text.isspace() for text in lines):
+        games.append(lines)
+
+    loaded = []
+    seconds = {}
+    for lines in games:
+        tags = {}
+        for line in lines:
+            match = TAG_REGEX.match(line)
+            if match:
+                tags[match.group(1)] = match.group(2)
+        if "UTCDate" in tags and "UTCTime" in tags:
+            moment = datetime.strptime(
+                f"{tags['UTCDate']} {tags['UTCTime']}", "%Y.%m.%d %H:%M:%S"
+            )
+        else:
+            try:
+                day = datetime.strptime(tags.get("Date", ""), "%Y.%m.%d")
+            except ValueError:
+                day = datetime(1970, 1, 1)
+            moment = day + timedelta(seconds=seconds.get(day, 0))
+            seconds[day] = seconds.get(day, 0) + 1
+            extra = [
+                f'[UTCDate "{moment:%Y.%m.%d}"]\n',
+                f'[UTCTime "{moment:%H:%M:%S}"]\n',
+            ]
+            # After the last tag pair
+            end = 1 + max(
+                index for index, line in enumerate(lines) if line.startswith("[")
+            )
+            lines = lines[:end] + extra + lines[end:]
+        pgn = "".join(lines).strip() + "\n"
+        created = timegm(moment.timetuple()) * 1000
+        loaded.append((created, tags.get("White", "?"), tags.get("Black", "?"), pgn))
+    return loaded
+
+
+class FakeLichess(ThreadingHTTPServer):
+    """
+    HTTP server answering /api/games/user/<username> like Lichess: since,
+    until, max and sort, PGN or NDJSON (pgnInJson) by the Accept header,
+    streamed with chunked transfer encoding.
+    - games: As returned by load_games
+    - games_per_second: Streaming speed, 0 for as fast as possible
+    - throttle: Answer this many first requests with 429
+    - drop_after: Close the first response after this many games
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self, address, games, games_per_second=0, throttle=0, drop_after=None
+    ):
+        super().__init__(address, ExportHandler)
+        self.games = sorted(games, key=lambda game: game[0])
+        self.games_per_second = games_per_second
+        self.throttle = throttle
+        self.drop_after = drop_after
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class ExportHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _error(self, status, message):
+        body = json.dumps({"error": message}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        if not url.path.startswith("/api/games/user/"):
+            return self._error(404, "Not found")
+        username = unquote(url.path[len("/api/games/user/") :]).lower()
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        with server.lock:
+            server.requests += 1
+            request = server.requests
+        if request <= server.throttle:
+            return self._error(429, "Too many requests, try again later")
+
+        since = int(query.get("since", 0))
+        until = int(query.get("until", 2**63))
+        games = [
+            game
+            for game in server.games
+            if username in (game[1].lower(), game[2].lower())
+            and since <= game[0] <= until
+        ]
+        if query.get("sort", "dateDesc") != "dateAsc":
+            games.reverse()
+        if "max" in query:
+            games = games[: int(query["max"])]
+        ndjson = "application/x-ndjson" in self.headers.get("Accept", "")
+        drop_after = server.drop_after if request == server.throttle + 1 else None
+
+        self.send_response(200)
+        content_type = "application/x-ndjson" if ndjson else "application/x-chess-pgn"
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        for sent, (created, white, black, pgn) in enumerate(games):
+            if ndjson:
+                game = {"createdAt": created, "players": [white, black], "pgn": pgn}
+                text = json.dumps(game) + "\n"
+            else:
+                text = pgn + "\n\n"
+            if drop_after is not None and sent == drop_after:
+                # Half a game, then the connection goes away
+                self._chunk(text[: len(text) // 2])
+                self.close_connection = True
+                return
+            try:
+                self._chunk(text)
+            except ConnectionError:
+                # The client stopped reading
+                self.close_connection = True
+                return
+            if server.games_per_second:
+                time.sleep(1 / server.games_per_second)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+
+def serve(file_path, port=0, **options):
+    """
+    Start a FakeLichess on 127.0.0.1 in a background thread and return it,
+    port 0 picks a free port (see server.url). Stop it with shutdown().
+    """
+    server = FakeLichess(("127.0.0.1", port), load_games(file_path), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the Lichess export API"
+    )
+    parser.add_argument("pgn_file")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--games-per-second", type=float, default=0)
+    parser.add_argument(
+        "--throttle", type=int, default=0, help="Answer the first requests with 429"
+    )
+    parser.add_argument("--drop-after", type=int, help="Cut the first response short")
+    args = parser.parse_args()
+
+    server = FakeLichess(
+        ("127.0.0.1", args.port),
+        load_games(args.pgn_file),
+        args.games_per_second,
+        args.throttle,
+        args.drop_after,
+    )
+    print(f"Serving {len(server.games)} games on {server.url}")
+    server.serve_forever()
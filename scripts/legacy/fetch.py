@@ -0,0 +1,540 @@
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import queue
+import ssl
+import threading
+from calendar import timegm
+from datetime import datetime
+from urllib.parse import quote, urlencode, urlsplit
+
+from lyir import (
+    TAG_REGEX,
+    add_game,
+    new_stats,
+    scan_games,
+    stats_from_dict,
+    stats_to_dict,
+)
+
+LICHESS_URL = "https://lichess.org"
+EXPORT_PATH = "/api/games/user/{}"
+
+# Connections shared by the downloads of a batch, Lichess asks for one
+# stream at a time per client, more only help against other servers
+DEFAULT_CONNECTIONS = 1
+
+# Seconds to wait after a 429 without Retry-After, doubled on each retry;
+# Lichess asks for a full minute
+DEFAULT_BACKOFF = 60
+MAX_BACKOFF = 600
+DEFAULT_RETRIES = 5
+
+# Games downloaded ahead of the parser before the download waits
+QUEUE_GAMES = 1000
+
+# Bump when the state layout changes, older state files are ignored
+STATE_VERSION = 3
+
+FORMATS = {"pgn": "application/x-chess-pgn", "ndjson": "application/x-ndjson"}
+
+
+class FetchError(Exception):
+    pass
+
+
+class _Retry(Exception):
+    # A response worth retrying later, with the Retry-After delay if any
+    pass
+
+
+def _tags(lines):
+    tags = {}
+    for line in lines:
+        if not line.startswith("["):
+            break
+        match = TAG_REGEX.match(line)
+        if match:
+            tags[match.group(1)] = match.group(2)
+    return tags
+
+
+def game_timestamp(lines):
+    # Milliseconds since the epoch of the second a PGN game started, from
+    # UTCDate and UTCTime, None when the tags are missing
+    tags = _tags(lines)
+    try:
+        moment = datetime.strptime(
+            f"{tags['UTCDate']} {tags['UTCTime']}", "%Y.%m.%d %H:%M:%S"
+        )
+    except (KeyError, ValueError):
+        return None
+    return timegm(moment.timetuple()) * 1000
+
+
+def game_id(lines):
+    # The Site of a PGN game, its URL on Lichess, or a digest of the game
+    # when it has none, to tell apart the games started in the same second
+    site = _tags(lines).get("Site", "?")
+    if site not in ("", "?"):
+        return site
+    return hashlib.blake2b("".join(lines).encode(), digest_size=16).hexdigest()
+
+
+class Response:
+    """
+    Status, headers and body of an HTTP/1.1 response read from a stream,
+    the body chunked, sized or running until the connection closes.
+    """
+
+    def __init__(self, reader, status, headers):
+        self.reader = reader
+        self.status = status
+        self.headers = headers
+        self.complete = False
+
+    @classmethod
+    async def read_head(cls, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed before the response")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return cls(reader, status, headers)
+
+    @property
+    def keep_alive(self):
+        return self.headers.get("connection", "").lower() != "close"
+
+    async def chunks(self):
+        # Body as it arrives, decoded from the transfer encoding
+        reader = self.reader
+        if self.headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size_line = await reader.readline()
+                if not size_line:
+                    raise asyncio.IncompleteReadError(b"", None)
+                size = int(size_line.split(b";")[0], 16)
+                if size == 0:
+                    # Trailers up to the empty line
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                yield await reader.readexactly(size)
+                await reader.readline()
+        elif "content-length" in self.headers:
+            remaining = int(self.headers["content-length"])
+            while remaining:
+                chunk = await reader.read(min(remaining, 65536))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b"", remaining)
+                remaining -= len(chunk)
+                yield chunk
+        else:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                yield chunk
+        self.complete = True
+
+    async def lines(self):
+        # Body as text lines, keeping their line ends
+        pending = b""
+        async for chunk in self.chunks():
+            pending += chunk
+            *complete, pending = pending.split(b"\n")
+            for line in complete:
+                yield line.decode("utf-8") + "\n"
+        if pending:
+            yield pending.decode("utf-8")
+
+    async def read(self):
+        return b"".join([chunk async for chunk in self.chunks()])
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP/1.1 connections to one server, at most size of them
+    open at once, for the concurrent downloads of a batch.
+    - base_url: Scheme, host and optional port, e.g. "https://lichess.org"
+    - size: Maximum number of connections
+    """
+
+    def __init__(self, base_url, size=DEFAULT_CONNECTIONS):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.tls = url.scheme == "https"
+        self.port = url.port or (443 if self.tls else 80)
+        self.idle = []
+        self.slots = asyncio.Semaphore(size)
+
+    async def _open(self):
+        context = ssl.create_default_context() if self.tls else None
+        return await asyncio.open_connection(self.host, self.port, ssl=context)
+
+    @contextlib.asynccontextmanager
+    async def request(self, path, headers=None):
+        """
+        Send a GET request and yield the Response once its head is read.
+        The connection goes back to the pool when the body was read to the end.
+        """
+        lines = [f"GET {path} HTTP/1.1", f"Host: {self.host}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        message = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+        async with self.slots:
+            while True:
+                reused = bool(self.idle)
+                reader, writer = self.idle.pop() if reused else await self._open()
+                try:
+                    writer.write(message)
+                    await writer.drain()
+                    response = await Response.read_head(reader)
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    # The server may have closed an idle connection meanwhile
+                    if not reused:
+                        raise
+            try:
+                yield response
+            finally:
+                if response.complete and response.keep_alive:
+                    self.idle.append((reader, writer))
+                else:
+                    writer.close()
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle = []
+
+
+async def export_games(
+    pool,
+    username,
+    since=None,
+    seen=None,
+    fmt="pgn",
+    token=None,
+    params=None,
+    backoff=DEFAULT_BACKOFF,
+    retries=DEFAULT_RETRIES,
+):
+    """
+    Async generator over (after, lines) of every game of a user from the
+    Lichess export API, oldest first, while it downloads. after is the since
+    value to resume from, None when the game has no timestamp: the time the
+    game was created (createdAt for NDJSON, UTCDate and UTCTime in whole
+    seconds for PGN). The export sends the games of that time again, and
+    those already yielded are skipped by game_id. Only complete games are
+    yielded, so after a dropped connection or a 429 the download resumes
+    after the last game yielded.
+    - pool: ConnectionPool to the server
+    - since: Milliseconds since the epoch of the first game wanted
+    - seen: game_id of the games at since already had, e.g. by a previous
+      run that stopped there
+    - fmt: "pgn" or "ndjson" (with the PGN of each game inside)
+    - token: Lichess API token, for the higher rate limit of a logged in user
+    - params: Extra query parameters, e.g. {"perfType": "blitz"}
+    - backoff: Seconds to wait after a 429 or a failure, doubled on each retry
+    - retries: Failed attempts in a row before giving up
+    """
+    headers = {"Accept": FORMATS[fmt], "Connection": "keep-alive"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    seen = set(seen or ())
+    failures = 0
+
+    while True:
+        query = {
+            "sort": "dateAsc",
+            "opening": "true",
+            "clocks": "false",
+            "evals": "false",
+        }
+        if fmt == "ndjson":
+            query["pgnInJson"] = "true"
+        if since is not None:
+            query["since"] = since
+        query.update(params or {})
+        path = EXPORT_PATH.format(quote(username)) + "?" + urlencode(query)
+
+        try:
+            async with pool.request(path, headers) as response:
+                if response.status == 429 or response.status >= 500:
+                    await response.read()
+                    delay = response.headers.get("retry-after")
+                    raise _Retry(float(delay) if delay else None)
+                if response.status != 200:
+                    await response.read()
+                    raise FetchError(f"{response.status} for {username}")
+
+                games = _ndjson_games if fmt == "ndjson" else _pgn_games
+                async for after, lines in games(response):
+                    if after is not None:
+                        # Resume from the game's own time, a later game may
+                        # have started at the same one
+                        identifier = game_id(lines)
+                        if after != since:
+                            since, seen = after, set()
+                        elif identifier in seen:
+                            continue
+                        seen.add(identifier)
+                    failures = 0
+                    yield after, lines
+                return
+        except (_Retry, ConnectionError, asyncio.IncompleteReadError) as error:
+            failures += 1
+            if failures > retries:
+                raise FetchError(f"Giving up on {username} after {retries} retries")
+            delay = error.args[0] if isinstance(error, _Retry) else None
+            if delay is None:
+                delay = min(backoff * 2 ** (failures - 1), MAX_BACKOFF)
+            await asyncio.sleep(delay)
+
+
+async def _ndjson_games(response):
+    # (createdAt, lines) of the games of an NDJSON body
+    async for line in response.lines():
+        if line.strip():
+            game = json.loads(line)
+            yield game["createdAt"], game["pgn"].splitlines(True) + ["\n"]
+
+
+async def _pgn_games(response):
+    # (timestamp, lines) of the complete games of a PGN body, a game ends
+    # where the next one starts
+    buffered = []
+    async for line in response.lines():
+        if line.startswith("[Event ") and buffered:
+            yield game_timestamp(buffered), buffered
+            buffered = []
+        buffered.append(line)
+    if any(not line.isspace() for line in buffered):
+        yield game_timestamp(buffered), buffered
+
+
+class Fetcher:
+    """
+    Download the games of several users on an event loop in a background
+    thread, handing complete games to the calling thread through a bounded
+    queue, so the games are parsed while the rest is still downloading.
+    - usernames: Users to download, each from their own since timestamp
+    - since: {username: timestamp} of the first game wanted per user
+    - seen: {username: game ids} already had at since, see export_games
+    - connections: Downloads running at once
+    - options: Passed to export_games (fmt, token, params, backoff, retries)
+    """
+
+    def __init__(
+        self,
+        usernames,
+        base_url=LICHESS_URL,
+        since=None,
+        seen=None,
+        connections=DEFAULT_CONNECTIONS,
+        **options,
+    ):
+        self.usernames = list(usernames)
+        self.base_url = base_url
+        self.since = since or {}
+        self.seen = seen or {}
+        self.connections = connections
+        self.options = options
+        self.queue = queue.Queue(QUEUE_GAMES)
+        self.stopped = threading.Event()
+
+    async def _put(self, item):
+        # Wait for room without blocking the other downloads
+        while not self.stopped.is_set():
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                await asyncio.sleep(0.01)
+
+    async def _download(self, pool, username):
+        since, seen = self.since.get(username), self.seen.get(username)
+        async for after, lines in export_games(
+            pool, username, since, seen, **self.options
+        ):
+            if self.stopped.is_set():
+                break
+            await self._put((username, after, lines))
+
+    async def _run(self):
+        pool = ConnectionPool(self.base_url, self.connections)
+        try:
+            await asyncio.gather(
+                *(self._download(pool, username) for username in self.usernames)
+            )
+        finally:
+            pool.close()
+
+    def _thread(self):
+        try:
+            asyncio.run(self._run())
+            item = None
+        except Exception as error:
+            item = error
+        # The end of the downloads, or the error that stopped them
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def __iter__(self):
+        """
+        (username, after, lines) of every game in the order downloaded, see
+        export_games.
+        """
+        thread = threading.Thread(target=self._thread, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.stopped.set()
+            thread.join()
+
+
+def state_path(state_dir, username):
+    return os.path.join(state_dir, f"{username}.fetch.json")
+
+
+def load_state(path, username):
+    """
+    Stats, since timestamp and ids of the games had at it saved by a previous
+    fetch, or (None, None, None).
+    """
+    try:
+        with open(path, "r") as file:
+            state = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None, None, None
+    if state.get("version") != STATE_VERSION or state.get("username") != username:
+        return None, None, None
+    return stats_from_dict(state["stats"]), state.get("since"), state.get("seen")
+
+
+def save_state(path, username, stats, since, seen=()):
+    state = {
+        "version": STATE_VERSION,
+        "username": username,
+        "since": since,
+        "seen": sorted(seen),
+        "stats": stats_to_dict(stats),
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(state, file)
+    os.replace(temporary, path)
+
+
+def fetch_stats(usernames, state_dir=None, save_dir=None, sketch=None, **options):
+    """
+    Download and analyze the games of users, parsing each game as soon as
+    it arrives. Games are analyzed oldest first. With state_dir, the stats
+    and the time of the last game are kept per user, and the next run only
+    downloads the games played since and merges them in.
+    - usernames: Lichess usernames
+    - state_dir: Directory of the resume state files, None to start over
+    - save_dir: Also append the downloaded games to save_dir/<username>.pgn
+    - sketch: Options of new_stats for users without a saved state
+    - options: Passed to Fetcher (base_url, connections, fmt, token, ...)
+    Returns {username: stats}.
+    """
+    results = {}
+    since = {}
+    seen = {}
+    for username in usernames:
+        stats = None
+        if state_dir:
+            path = state_path(state_dir, username)
+            stats, since[username], seen[username] = load_state(path, username)
+        results[username] = stats if stats is not None else new_stats(sketch)
+
+    latest = dict(since)
+    had = {username: set(ids or ()) for username, ids in seen.items()}
+    outputs = {}
+    try:
+        fetcher = Fetcher(usernames, since=since, seen=seen, **options)
+        for username, after, lines in fetcher:
+            for game in scan_games(lines):
+                add_game(results[username], game, username)
+            if after is not None:
+                # The games had at the resume point, as export_games skips them
+                if after != latest.get(username):
+                    latest[username], had[username] = after, set()
+                had[username].add(game_id(lines))
+            if save_dir:
+                if username not in outputs:
+                    os.makedirs(save_dir, exist_ok=True)
+                    path = os.path.join(save_dir, f"{username}.pgn")
+                    outputs[username] = open(path, "a")
+                outputs[username].writelines(lines)
+    finally:
+        for output in outputs.values():
+            output.close()
+
+    if state_dir:
+        for username, stats in results.items():
+            path = state_path(state_dir, username)
+            save_state(
+                path, username, stats, latest.get(username), had.get(username, ())
+            )
+    return results
+
+
+if __name__ == "__main__":
+    from lyir import display_stats
+
+    parser = argparse.ArgumentParser(description="Download and analyze Lichess games")
+    parser.add_argument("usernames", nargs="+")
+    parser.add_argument("--base-url", default=LICHESS_URL)
+    parser.add_argument("--format", choices=sorted(FORMATS), default="pgn")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS)
+    parser.add_argument("--token", default=os.environ.get("LICHESS_TOKEN"))
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF)
+    parser.add_argument("--state-dir", help="Resume from and save the state here")
+    parser.add_argument("--save-dir", help="Also append the games to DIR/<user>.pgn")
+    parser.add_argument("--json", action="store_true", help="Print the stats as JSON")
+    args = parser.parse_args()
+
+    results = fetch_stats(
+        args.usernames,
+        state_dir=args.state_dir,
+        save_dir=args.save_dir,
+        base_url=args.base_url,
+        connections=args.connections,
+        fmt=args.format,
+        token=args.token,
+        backoff=args.backoff,
+    )
+    for username, stats in results.items():
+        if args.json:
+            print(json.dumps({"username": username, "stats": stats_to_dict(stats)}))
+        else:
+            print(f"\n== {username} ==")
+            display_stats(stats, username=username, charts=False)
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from lyir import RECORD_TAGS, GameRecord, iter_games, mainline_length
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "lyir",
+    "games.sqlite",
+)
+
+# Total size of the cached records before the least recently used are evicted
+DEFAULT_MAX_BYTES = 1 << 30
+
+# Bump when the record layout or its encoding changes, entries are looked up
+# by version so older ones are ignored. Records are stored as JSON, which
+# unlike marshal reads the same on every Python version
+CACHE_VERSION = 2
+
+
+def file_digest(file_path):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def game_to_record(game):
+    # The RECORD_TAGS values (None when absent) followed by the ply count
+    headers = game.headers
+    return tuple(headers.get(tag) for tag in RECORD_TAGS) + (mainline_length(game),)
+
+
+def record_to_game(record):
+    return GameRecord(*record)
+
+
+class GameCache:
+    """
+    Persistent cache of the parsed header records of PGN files, in SQLite.
+    Entries are keyed by the content hash of the file. A file whose size and
+    mtime match a cached entry is not hashed again, any other file is hashed
+    and only parsed when no entry has its content.
+    - cache_path: Path to the SQLite database
+    - max_bytes: Size cap of the stored records, enforced with LRU eviction
+    """
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                digest TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                data BLOB NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS entries_path ON entries (path)"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def games(self, file_path):
+        """
+        The games of a PGN file as GameRecord objects, parsed only on a miss.
+        """
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+
+        row = self.connection.execute(
+            "SELECT digest, data FROM entries"
+            " WHERE path = ? AND size = ? AND mtime_ns = ? AND version = ?",
+            (path, stat.st_size, stat.st_mtime_ns, CACHE_VERSION),
+        ).fetchone()
+        if row is None:
+            digest = file_digest(path)
+            row = self.connection.execute(
+                "SELECT digest, data FROM entries WHERE digest = ? AND version = ?",
+                (digest, CACHE_VERSION),
+            ).fetchone()
+
+        if row is not None:
+            digest, data = row
+            with self.connection:
+                self.connection.execute(
+                    "UPDATE entries SET path = ?, size = ?, mtime_ns = ?, last_used = ?"
+                    " WHERE digest = ?",
+                    (path, stat.st_size, stat.st_mtime_ns, time.time(), digest),
+                )
+            records = json.loads(zlib.decompress(data))
+        else:
+            records = [game_to_record(game) for game in iter_games(path, fast=True)]
+            self._store(digest, path, stat, records)
+
+        return [record_to_game(record) for record in records]
+
+    def _store(self, digest, path, stat, records):
+        data = zlib.compress(json.dumps(records, separators=(",", ":")).encode(), 1)
+        if len(data) > self.max_bytes:
+            return
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    digest,
+                    CACHE_VERSION,
+                    path,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    time.time(),
+                    data,
+                ),
+            )
+            # Stale entries for this path can never be hit again
+            self.connection.execute(
+                "DELETE FROM entries WHERE path = ? AND digest != ?", (path, digest)
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self.connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM entries"
+        ).fetchone()[0]
+        rows = self.connection.execute(
+            "SELECT digest, LENGTH(data) FROM entries ORDER BY last_used"
+        ).fetchall()
+        for digest, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.connection.execute("DELETE FROM entries WHERE digest = ?", (digest,))
+            total -= size
@@ -0,0 +1,376 @@
+from array import array
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import numpy as np
+
+from lyir import (
+    DAILY_FIELDS,
+    DAILY_ZEROS,
+    RatingIndex,
+    categorize_time_control,
+    iter_games,
+    mainline_length,
+    new_month,
+    new_record,
+)
+
+# Category codes, in GAME_TYPE_MAP order
+CATEGORIES = ("Bullet", "Blitz", "Rapid", "Classical")
+
+# Bits of the color column, set when the user played that side
+WHITE = 1
+BLACK = 2
+
+# The first result codes are fixed, any other result string gets the next free code
+RESULT_WHITE_WINS = 0
+RESULT_BLACK_WINS = 1
+RESULT_DRAW = 2
+RESULTS = ("1-0", "0-1", "1/2-1/2")
+
+# User Elo of games where the user's rating is missing or unparseable
+MISSING_ELO = np.iinfo(np.int32).min
+
+
+class GameTable:
+    """
+    Columnar view of a user's games, one NumPy array per field.
+    - date: datetime64[D], NaT where the Date header does not parse
+    - category: Index into CATEGORIES
+    - color: WHITE and/or BLACK bits for the side(s) the user played
+    - result: Index into results
+    - elo: The user's Elo, MISSING_ELO when absent
+    - rating_diff: The user's rating change, 0 when absent
+    - plies: Mainline length
+    - opponent: Index into opponents, -1 when there is no opponent name
+    - opening: Index into openings
+    Strings are dictionary-encoded in order of first appearance. Games whose
+    time control has no category are left out and counted in skipped.
+    """
+
+    def __init__(self, columns, results, opponents, openings, skipped=0):
+        self.date = columns["date"]
+        self.category = columns["category"]
+        self.color = columns["color"]
+        self.result = columns["result"]
+        self.elo = columns["elo"]
+        self.rating_diff = columns["rating_diff"]
+        self.plies = columns["plies"]
+        self.opponent = columns["opponent"]
+        self.opening = columns["opening"]
+        self.results = results
+        self.opponents = opponents
+        self.openings = openings
+        self.skipped = skipped
+
+    def __len__(self):
+        return len(self.result)
+
+    @classmethod
+    def from_games(cls, games, username):
+        """
+        Build the table from chess.pgn.Game or ScannedGame objects.
+        Time controls and dates are parsed once per distinct string.
+        """
+        category_codes = {}
+        date_values = {}
+        result_codes = {result: code for code, result in enumerate(RESULTS)}
+        opponent_ids = {}
+        opening_ids = {}
+        skipped = 0
+
+        dates = []
+        categories = []
+        colors = []
+        results = []
+        elos = []
+        rating_diffs = []
+        plies = []
+        opponents = []
+        openings = []
+
+        for game in games:
+            headers = game.headers
+
+            time_control = headers.get("TimeControl", "Unknown")
+            category = category_codes.get(time_control)
+            if category is None:
+                try:
+                    category = CATEGORIES.index(categorize_time_control(time_control))
+                except ValueError:
+                    category = -1
+                category_codes[time_control] = category
+            if category == -1:
+                skipped += 1  # Skipped like in add_game
+                continue
+            categories.append(category)
+
+            date = headers.get("Date", "????.??.??")
+            value = date_values.get(date)
+            if value is None:
+                try:
+                    value = np.datetime64(datetime.strptime(date, "%Y.%m.%d"), "D")
+                except ValueError:
+                    value = np.datetime64("NaT", "D")
+                date_values[date] = value
+            dates.append(value)
+
+            result = headers.get("Result", "*")
+            code = result_codes.get(result)
+            if code is None:
+                code = result_codes[result] = len(result_codes)
+            results.append(code)
+
+            white_player = headers["White"]
+            black_player = headers["Black"]
+            color = (WHITE if white_player == username else 0) | (
+                BLACK if black_player == username else 0
+            )
+            colors.append(color)
+
+            # The user's side, White first like get_rating_progression
+            if color & WHITE:
+                elo, diff = headers.get("WhiteElo"), headers.get("WhiteRatingDiff")
+            elif color & BLACK:
+                elo, diff = headers.get("BlackElo"), headers.get("BlackRatingDiff")
+            else:
+                elo, diff = None, None
+            try:
+                elos.append(int(elo) if elo else MISSING_ELO)
+            except ValueError:
+                elos.append(MISSING_ELO)
+            try:
+                rating_diffs.append(int(diff) if diff else 0)
+            except ValueError:
+                rating_diffs.append(0)
+
+            plies.append(mainline_length(game))
+
+            opponent = white_player if black_player == username else black_player
+            if opponent:
+                opponents.append(opponent_ids.setdefault(opponent, len(opponent_ids)))
+            else:
+                opponents.append(-1)
+
+            opening = headers.get("Opening", "Unknown")
+            openings.append(opening_ids.setdefault(opening, len(opening_ids)))
+
+        columns = {
+            "date": np.array(dates, dtype="datetime64[D]"),
+            "category": np.array(categories, dtype=np.int8),
+            "color": np.array(colors, dtype=np.uint8),
+            "result": np.array(results, dtype=np.int16),
+            "elo": np.array(elos, dtype=np.int32),
+            "rating_diff": np.array(rating_diffs, dtype=np.int32),
+            "plies": np.array(plies, dtype=np.int32),
+            "opponent": np.array(opponents, dtype=np.int32),
+            "opening": np.array(openings, dtype=np.int32),
+        }
+        return cls(
+            columns, list(result_codes), list(opponent_ids), list(opening_ids), skipped
+        )
+
+    @classmethod
+    def from_pgn(cls, file_path, username):
+        return cls.from_games(iter_games(file_path, fast=True), username)
+
+
+def _tally(ids, size, wins, losses, draws):
+    # Per-id wins/losses/draws as a dict of dicts, in id order
+    counts = [
+        np.bincount(ids[mask], minlength=size).tolist()
+        for mask in (wins, losses, draws)
+    ]
+    return {
+        key: {"wins": win_count, "losses": loss_count, "draws": draw_count}
+        for key, win_count, loss_count, draw_count in zip(range(size), *counts)
+    }
+
+
+def _streaks(outcomes):
+    # Longest, current and first run of each outcome (0: win, 1: loss, 2: draw)
+    longest = [0, 0, 0]
+    current = [0, 0, 0]
+    first = [0, 0, 0]
+    if len(outcomes):
+        starts = np.flatnonzero(outcomes[1:] != outcomes[:-1]) + 1
+        starts = np.concatenate(([0], starts))
+        lengths = np.diff(np.append(starts, len(outcomes)))
+        kinds = outcomes[starts]
+        for kind in range(3):
+            runs = lengths[kinds == kind]
+            if len(runs):
+                longest[kind] = int(runs.max())
+        current[int(kinds[-1])] = int(lengths[-1])
+        first[int(kinds[0])] = int(lengths[0])
+    return longest, current, first
+
+
+def analyze_table(table):
+    """
+    Vectorized analyze_games over a GameTable, producing the same stats.
+    """
+    is_white = (table.color & WHITE) != 0
+    is_black = (table.color & BLACK) != 0
+    white_wins = table.result == RESULT_WHITE_WINS
+    black_wins = table.result == RESULT_BLACK_WINS
+    draws = table.result == RESULT_DRAW
+
+    wins = (white_wins & is_white) | (black_wins & is_black)
+    losses = (white_wins & ~is_white) | (black_wins & ~is_black)
+
+    stats = {}
+
+    # Game types, in order of first appearance like the Counter in analyze_games
+    codes, first_seen = np.unique(table.category, return_index=True)
+    counts = np.bincount(table.category, minlength=len(CATEGORIES))
+    stats["game_types"] = Counter(
+        {
+            CATEGORIES[code]: int(counts[code])
+            for code in codes[np.argsort(first_seen)].tolist()
+        }
+    )
+
+    stats["results"] = {
+        "wins": int(wins.sum()),
+        "losses": int(losses.sum()),
+        "draws": int(draws.sum()),
+    }
+
+    # Rating progression, every rated game with a date per game type
+    has_date = ~np.isnat(table.date)
+    rated = has_date & (table.elo != MISSING_ELO)
+    stats["ratings"] = RatingIndex()
+    for code, category in enumerate(CATEGORIES):
+        rows = np.flatnonzero(rated & (table.category == code))
+        stats["ratings"].days[category].frombytes(
+            table.date[rows].astype(np.int32).tobytes()
+        )
+        stats["ratings"].ratings[category].frombytes(
+            table.elo[rows].astype(np.int32).tobytes()
+        )
+
+    openings = _tally(table.opening, len(table.openings), white_wins, black_wins, draws)
+    stats["openings"] = Counter(
+        dict(
+            zip(
+                table.openings,
+                np.bincount(table.opening, minlength=len(table.openings)).tolist(),
+            )
+        )
+    )
+    stats["opening_success"] = defaultdict(
+        new_record,
+        {table.openings[key]: record for key, record in openings.items()},
+    )
+
+    stats["color_stats"] = {
+        "White": {
+            "wins": int((white_wins & is_white).sum()),
+            "losses": int((black_wins & ~is_black).sum()),
+            "draws": int((draws & is_white).sum()),
+        },
+        "Black": {
+            "wins": int((black_wins & is_black).sum()),
+            "losses": int((white_wins & ~is_white).sum()),
+            "draws": int((draws & ~is_white).sum()),
+        },
+    }
+
+    # Streaks over the decided games, undecided games do not break a run
+    decided = wins | losses | draws
+    outcomes = np.where(wins, 0, np.where(losses, 1, 2))[decided]
+    longest, current, first = _streaks(outcomes)
+    stats["streaks"] = {
+        "win_streak": longest[0],
+        "loss_streak": longest[1],
+        "draw_streak": longest[2],
+    }
+    stats["current_streak"] = {
+        "wins": current[0],
+        "losses": current[1],
+        "draws": current[2],
+    }
+    stats["first_streak"] = {"wins": first[0], "losses": first[1], "draws": first[2]}
+
+    # Game length aggregates as add_game keeps them, results in order of first game
+    long_games = table.plies > 1
+    codes, first = np.unique(table.result[long_games], return_index=True)
+    long_plies = table.plies[long_games]
+    long_results = table.result[long_games]
+    results = {}
+    for code in codes[np.argsort(first)].tolist():
+        plies = long_plies[long_results == code]
+        results[table.results[code]] = [
+            len(plies),
+            int(plies.sum()),
+            int(plies.min()),
+            int(plies.max()),
+        ]
+    stats["game_lengths"] = {
+        "games": len(table.plies),
+        "total": int(table.plies.sum()),
+        "results": results,
+    }
+
+    month = table.date[has_date].astype("datetime64[M]").astype(np.int64) % 12 + 1
+    month_wins = wins[has_date]
+    games_per_month = np.bincount(month, minlength=13)
+    wins_per_month = np.bincount(month[month_wins], minlength=13)
+    rating_change = np.zeros(13, dtype=np.int64)
+    np.add.at(rating_change, month[month_wins], table.rating_diff[has_date][month_wins])
+    stats["monthly_performance"] = defaultdict(
+        new_month,
+        {
+            month: {
+                "games": int(games_per_month[month]),
+                "wins": int(wins_per_month[month]),
+                "rating_change": int(rating_change[month]),
+            }
+            for month in np.flatnonzero(games_per_month).tolist()
+        },
+    )
+
+    # Per-day buckets laid out like add_game's, the side as game_outcome credits it
+    side = np.where(white_wins, ~is_white, np.where(black_wins, is_black, ~is_white))
+    offset = (table.category.astype(np.int64) * 2 + side) * len(DAILY_FIELDS)
+    field = np.select([wins, losses, draws], [1, 2, 3], 0)
+    days, day_index = np.unique(
+        table.date[has_date].astype(np.int64), return_inverse=True
+    )
+    cell = day_index * len(DAILY_ZEROS) + offset[has_date]
+    size = len(days) * len(DAILY_ZEROS)
+    decided = field[has_date] > 0
+    cells = np.bincount(cell, minlength=size)
+    cells += np.bincount(cell[decided] + field[has_date][decided], minlength=size)
+    cells += np.rint(
+        np.bincount(cell + 4, weights=table.rating_diff[has_date], minlength=size)
+    ).astype(np.int64)
+    stats["daily"] = {}
+    for day, row in zip(
+        days.tolist(), cells.reshape(-1, len(DAILY_ZEROS)).astype(np.int32)
+    ):
+        stats["daily"][day] = array("i")
+        stats["daily"][day].frombytes(row.tobytes())
+
+    missing_dates = len(table) - int(has_date.sum())
+    stats["malformed"] = Counter()
+    if table.skipped:
+        stats["malformed"]["time_control"] = table.skipped
+    if missing_dates:
+        stats["malformed"]["date"] = missing_dates
+
+    has_opponent = table.opponent >= 0
+    head_to_head = _tally(
+        table.opponent[has_opponent],
+        len(table.opponents),
+        white_wins[has_opponent],
+        black_wins[has_opponent],
+        draws[has_opponent],
+    )
+    stats["head_to_head"] = defaultdict(
+        new_record,
+        {table.opponents[key]: record for key, record in head_to_head.items()},
+    )
+
+    return stats
@@ -0,0 +1,25 @@
+import builtins
+import contextlib
+import io
+
+import matplotlib
+
+matplotlib.use("Agg")  # display_stats plots, keep it off screen
+
+import matplotlib.pyplot as plt
+
+from lyir import display_stats
+
+
+def display_quietly(stats):
+    """
+    Run display_stats with its output discarded, for timing it: the prompt
+    for a game type is answered with the default and the charts are closed.
+    """
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        original_input = builtins.input
+        builtins.input = lambda prompt="": ""
+        stack.callback(setattr, builtins, "input", original_input)
+        stack.callback(plt.close, "all")
+        display_stats(stats)
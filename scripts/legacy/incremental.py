@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+
+from lyir import (
+    analyze_games,
+    merge_stats,
+    new_stats,
+    scan_games,
+    stats_from_dict,
+    stats_to_dict,
+)
+from parallel import read_lines
+
+# Bump when the checkpoint layout changes, older checkpoints are ignored
+CHECKPOINT_VERSION = 4
+
+# Bytes before the checkpoint offset hashed to tell an append from a rewrite
+TAIL_BYTES = 4096
+
+
+# Movetext tokens that end a game
+RESULT_TOKENS = (b"1-0", b"0-1", b"1/2-1/2", b"*")
+
+
+def checkpoint_path(file_path, username):
+    return f"{file_path}.{username}.checkpoint.json"
+
+
+def tail_digest(file_path, offset):
+    with open(file_path, "rb") as file:
+        file.seek(max(0, offset - TAIL_BYTES))
+        data = file.read(min(offset, TAIL_BYTES))
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def load_checkpoint(path, file_path, username):
+    """
+    Stats and byte offset saved for a file, or (None, 0) when there is no
+    usable checkpoint: missing, another user, or a file that was rewritten
+    rather than appended to since.
+    """
+    try:
+        with open(path, "r") as file:
+            checkpoint = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None, 0
+
+    offset = checkpoint.get("offset", 0)
+    if (
+        checkpoint.get("version") != CHECKPOINT_VERSION
+        or checkpoint.get("username") != username
+        or os.path.getsize(file_path) < offset
+        or tail_digest(file_path, offset) != checkpoint.get("tail")
+    ):
+        return None, 0
+    return stats_from_dict(checkpoint["stats"]), offset
+
+
+def save_checkpoint(path, file_path, username, stats, offset):
+    checkpoint = {
+        "version": CHECKPOINT_VERSION,
+        "username": username,
+        "offset": offset,
+        "tail": tail_digest(file_path, offset),
+        "stats": stats_to_dict(stats),
+    }
+    temporary = path + ".tmp"
+    with open(temporary, "w") as file:
+        json.dump(checkpoint, file, separators=(",", ":"))
+    os.replace(temporary, path)
+
+
+def complete_end(file_path, start, end):
+    """
+    Offset just past the last game in the byte range whose movetext ends with
+    a result token, start when there is none, so a game still being written
+    at the end of the file is left for the next run.
+    """
+    complete = start
+    in_comment = False
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        position = start
+        for line in file:
+            if position >= end:
+                break
+            position += len(line)
+            text = line.strip()
+            if in_comment:
+                _, closed, text = text.partition(b"}")
+                if not closed:
+                    continue
+                in_comment = False
+            if text.startswith((b"[", b"%")):
+                continue  # Tag pairs and escaped lines
+            # Drop {comments}, which may run over lines, and ;comments
+            kept = []
+            while text:
+                brace, semicolon = text.find(b"{"), text.find(b";")
+                if brace < 0 and semicolon < 0:
+                    kept.append(text)
+                    break
+                if semicolon >= 0 and (brace < 0 or semicolon < brace):
+                    kept.append(text[:semicolon])
+                    break
+                kept.append(text[:brace])
+                _, closed, text = text[brace + 1 :].partition(b"}")
+                if not closed:
+                    in_comment = True
+            tokens = b" ".join(kept).split()
+            if tokens and tokens[-1] in RESULT_TOKENS:
+                complete = position
+    return complete
+
+
+def analyze_incremental(file_path, username, path=None):
+    """
+    Analyze an append-only PGN file, reading only the games added since the
+    last run and merging them into the checkpointed stats. A trailing game
+    without its result yet is left for the next run.
+    - file_path: Path to the PGN file
+    - username: The username of the player whose games are being analyzed
+    - path: Checkpoint file (default: next to the PGN file)
+    """
+    path = path or checkpoint_path(file_path, username)
+    stats, offset = load_checkpoint(path, file_path, username)
+    if stats is None:
+        stats = new_stats()
+
+    end = complete_end(file_path, offset, os.path.getsize(file_path))
+    if end > offset:
+        new_games = scan_games(read_lines(file_path, offset, end))
+        stats = merge_stats(stats, analyze_games(new_games, username))
+        save_checkpoint(path, file_path, username, stats, end)
+    return stats
@@ -0,0 +1,198 @@
+import argparse
+import contextlib
+import cProfile
+import json
+import sys
+import time
+
+import lyir
+from headless import display_quietly
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# lyir functions timed while hooks are installed, looked up as module globals
+# by scan_games and add_game so replacing them needs no change to lyir
+HOOKED_FUNCTIONS = ("count_plies", "parse_date", "categorize_time_control")
+
+
+def peak_rss():
+    # Peak resident set size of the process so far in bytes, None if unknown
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class TimedLines:
+    """
+    Line iterator over a text stream that times the reads and counts the
+    bytes returned, for the I/O share of the parse stage.
+    """
+
+    def __init__(self, file, counters):
+        self.file = file
+        self.counters = counters
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+    def __iter__(self):
+        counters = self.counters
+        file = self.file
+        clock = time.perf_counter
+        while True:
+            start = clock()
+            line = file.readline()
+            counters["seconds"] += clock() - start
+            if not line:
+                return
+            counters["bytes"] += len(line) if line.isascii() else len(line.encode())
+            yield line
+
+
+class Instrumentation:
+    """
+    Per-stage wall time, CPU time, games, bytes read and peak RSS, plus call
+    counts and time spent in the hot lyir helpers. Nothing is patched until
+    hooks() is entered, so lyir runs at full speed when this is not used.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.functions = {name: {"calls": 0, "seconds": 0.0} for name in HOOKED_FUNCTIONS}
+        self.io = {"seconds": 0.0, "bytes": 0}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Measure the block as one stage. The yielded dict takes the number of
+        games the stage handled as "games".
+        """
+        record = {"stage": name, "games": 0}
+        bytes_before = self.io["bytes"]
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = round(time.perf_counter() - wall_start, 6)
+            record["cpu_seconds"] = round(time.process_time() - cpu_start, 6)
+            record["bytes_read"] = self.io["bytes"] - bytes_before
+            record["peak_rss_bytes"] = peak_rss()
+            self.stages.append(record)
+
+    def _timed(self, name, function):
+        counters = self.functions[name]
+        clock = time.perf_counter
+
+        def timed(*args):
+            start = clock()
+            try:
+                return function(*args)
+            finally:
+                counters["calls"] += 1
+                counters["seconds"] += clock() - start
+
+        return timed
+
+    def _open_pgn(self, function):
+        def open_pgn(*args, **kwargs):
+            return TimedLines(function(*args, **kwargs), self.io)
+
+        return open_pgn
+
+    @contextlib.contextmanager
+    def hooks(self):
+        """
+        Swap the hot lyir helpers and open_pgn for timed wrappers, restoring
+        the originals on exit.
+        """
+        originals = {name: getattr(lyir, name) for name in HOOKED_FUNCTIONS}
+        originals["open_pgn"] = lyir.open_pgn
+        try:
+            for name in HOOKED_FUNCTIONS:
+                setattr(lyir, name, self._timed(name, originals[name]))
+            lyir.open_pgn = self._open_pgn(originals["open_pgn"])
+            yield self
+        finally:
+            for name, function in originals.items():
+                setattr(lyir, name, function)
+
+    def report(self, stats=None):
+        report = {
+            "stages": self.stages,
+            "io": {
+                "seconds": round(self.io["seconds"], 6),
+                "bytes": self.io["bytes"],
+            },
+            "functions": {
+                name: {"calls": entry["calls"], "seconds": round(entry["seconds"], 6)}
+                for name, entry in self.functions.items()
+            },
+        }
+        if stats is not None:
+            report["malformed"] = dict(stats["malformed"])
+        return report
+
+
+def run_instrumented(file_path, username, profile_path=None):
+    """
+    Run the lyir pipeline on a PGN file stage by stage (parse, analyze,
+    display) with instrumentation, and return the JSON-ready report.
+    - file_path: Path to the PGN file
+    - username: The user whose games are analyzed
+    - profile_path: Also write a cProfile dump of the whole run here
+    """
+    instrumentation = Instrumentation()
+    profiler = cProfile.Profile() if profile_path else None
+
+    with instrumentation.hooks():
+        if profiler is not None:
+            profiler.enable()
+        try:
+            with instrumentation.stage("parse") as record:
+                games = lyir.parse_pgn(file_path, fast=True)
+                record["games"] = len(games)
+            with instrumentation.stage("analyze") as record:
+                stats = lyir.analyze_games(games, username)
+                record["games"] = len(games)
+            del games
+            with instrumentation.stage("display") as record:
+                display_quietly(stats)
+                record["games"] = sum(stats["game_types"].values())
+        finally:
+            if profiler is not None:
+                profiler.disable()
+
+    if profiler is not None:
+        profiler.dump_stats(profile_path)
+
+    report = instrumentation.report(stats)
+    report["file"] = file_path
+    report["username"] = username
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile the lyir pipeline by stage")
+    parser.add_argument("pgn_file")
+    parser.add_argument("username")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument(
+        "--profile", help="Write a cProfile dump (.prof) for snakeviz or flameprof"
+    )
+    args = parser.parse_args()
+
+    report = run_instrumented(args.pgn_file, args.username, args.profile)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
@@ -1,8 +1,12 @@
-import chess.pgn
-import matplotlib.pyplot as plt
+from array import array
 from collections import Counter, defaultdict
 from datetime import datetime
-import numpy as np
+import io
+import re
+import sys
+
+# chess.pgn, numpy and matplotlib.pyplot are imported where they are used, so
+# a text-only run does not pay for loading them
 
 
 # Categorize time controls
@@ -18,138 +22,807 @@ def categorize_time_control(time_control):
         return "Classical"
 
 
-def parse_pgn(file_path):
-    with open(file_path, "r") as file:
-        games = []
+def parse_date(date):
+    # PGN dates ("YYYY.MM.DD"), raises ValueError for unknown or partial dates
+    return datetime.strptime(date, "%Y.%m.%d")
+
+
+# Tag pairs and movetext tokens, as accepted by chess.pgn
+TAG_REGEX = re.compile(r'^\[([A-Za-z0-9][A-Za-z0-9_+#=:-]*)\s+"([^\r]*)"\]\s*$')
+MOVETEXT_REGEX = re.compile(
+    r"""
+    (\{)                                            # comment start
+    |(;)                                            # rest-of-line comment
+    |(\$[0-9]+|[?!]{1,2})                           # NAG or move annotation
+    |(\()
+    |(\))
+    |([0-9]+\.+|\.+)                                 # move number
+    |(\*|1-0|0-1|1/2-1/2)                           # result
+    |([NBKRQ]?[a-h]?[1-8]?[-x]?[a-h][1-8](?:=?[nbrqkNBRQK])?[+#]?
+     |O-O(?:-O)?[+#]?|0-0(?:-0)?[+#]?)               # SAN move
+    |(\S+)                                          # anything else
+    """,
+    re.VERBOSE,
+)
+
+# The seven tag roster, with the defaults chess.pgn fills in
+DEFAULT_HEADERS = {
+    "Event": "?",
+    "Site": "?",
+    "Date": "????.??.??",
+    "Round": "?",
+    "White": "?",
+    "Black": "?",
+    "Result": "*",
+}
+
+# Header fields read by the analysis, all a game record needs to keep
+RECORD_TAGS = (
+    "White",
+    "Black",
+    "Result",
+    "Date",
+    "TimeControl",
+    "WhiteElo",
+    "BlackElo",
+    "WhiteRatingDiff",
+    "BlackRatingDiff",
+    "Opening",
+)
+
+
+class ScannedGame:
+    """
+    Header-only stand-in for chess.pgn.Game produced by scan_games.
+    - headers: Dict of tag pairs, with the seven tag roster defaults
+    - plies: Number of half-moves in the mainline
+    - moves: SAN of the first mainline moves when scanned with opening_plies,
+      None otherwise
+    """
+
+    __slots__ = ("headers", "plies", "moves")
+
+    def __init__(self, headers, plies, moves=None):
+        self.headers = headers
+        self.plies = plies
+        self.moves = moves
+
+
+class GameRecord:
+    """
+    Compact game holding only the RECORD_TAGS values and the ply count.
+    Strings are interned so repeated names, openings and time controls are
+    stored once. The record is its own read-only headers mapping, so it can
+    be analyzed like a chess.pgn.Game or ScannedGame, but it keeps no moves
+    and cannot be used where they are needed, e.g. by opening_tree.
+    """
+
+    __slots__ = (
+        "white",
+        "black",
+        "result",
+        "date",
+        "time_control",
+        "white_elo",
+        "black_elo",
+        "white_rating_diff",
+        "black_rating_diff",
+        "opening",
+        "plies",
+    )
+
+    def __init__(self, *values):
+        # RECORD_TAGS values in order (None when absent), then the ply count
+        for slot, value in zip(self.__slots__[:-1], values):
+            setattr(self, slot, sys.intern(value) if value is not None else None)
+        self.plies = values[-1]
+
+    @classmethod
+    def from_game(cls, game):
+        headers = game.headers
+        values = [headers.get(tag) for tag in RECORD_TAGS]
+        return cls(*values, mainline_length(game))
+
+    @property
+    def headers(self):
+        return self
+
+    def get(self, tag, default=None):
+        slot = RECORD_SLOTS.get(tag)
+        value = getattr(self, slot) if slot else None
+        return default if value is None else value
+
+    def __getitem__(self, tag):
+        value = self.get(tag)
+        if value is None:
+            raise KeyError(tag)
+        return value
+
+    def __contains__(self, tag):
+        return self.get(tag) is not None
+
+
+RECORD_SLOTS = dict(zip(RECORD_TAGS, GameRecord.__slots__))
+
+
+def mainline_length(game):
+    # Scanned games and records already know their ply count, python-chess games
+    # replay the mainline. Not an isinstance test: run as a script, this module
+    # is __main__ and the records of game_cache come from the lyir module
+    plies = getattr(game, "plies", None)
+    if plies is not None:
+        return plies
+    return len(list(game.mainline_moves()))
+
+
+def count_plies(movetext_lines, opening=None, opening_plies=0):
+    """
+    Count the mainline plies of a game from its movetext lines.
+    Comments, NAGs, variations and move numbers are skipped. Returns
+    (plies, result), result being the first decisive termination token of
+    the mainline ("1-0", "0-1" or "1/2-1/2") or None. Returns None when the
+    movetext contains anything the scanner does not handle (null moves,
+    drops, unterminated comments, stray tokens), in which case the game
+    should be parsed by python-chess instead. Move legality is not checked,
+    Lichess exports only contain legal games.
+    - opening: List that receives the SAN of the first opening_plies
+      mainline moves, as written in the movetext
+    """
+    plies = 0
+    depth = 0
+    in_comment = False
+    result = None
+
+    for line in movetext_lines:
+        pos = 0
+        while True:
+            if in_comment:
+                close = line.find("}", pos)
+                if close == -1:
+                    break
+                in_comment = False
+                pos = close + 1
+
+            match = MOVETEXT_REGEX.search(line, pos)
+            if match is None:
+                break
+            pos = match.end()
+            kind = match.lastindex
+
+            if kind == 1:
+                in_comment = True
+            elif kind == 2:
+                break
+            elif kind == 4:
+                # chess.pgn ignores a variation that has no move to branch from
+                if plies == 0 and depth == 0:
+                    return None
+                depth += 1
+            elif kind == 5:
+                if depth == 0:
+                    return None
+                depth -= 1
+            elif kind == 7:
+                # chess.pgn reads a result in a variation as a bad move
+                if depth:
+                    return None
+                if result is None and match.group(7) != "*":
+                    result = match.group(7)
+            elif kind == 8:
+                if depth == 0:
+                    plies += 1
+                    if plies <= opening_plies:
+                        opening.append(match.group(8))
+            elif kind == 9:
+                return None
+
+    if in_comment or depth:
+        return None
+    return plies, result
+
+
+def scan_games(handle, opening_plies=0):
+    """
+    Generator over the games of a PGN text stream that only reads what the
+    analysis needs: the tag pairs and the mainline ply count. Games are split
+    the same way chess.pgn.read_game splits them. Games the scanner cannot
+    handle are parsed with python-chess instead and yielded as chess.pgn.Game.
+    - handle: Text stream or any iterable of lines
+    - opening_plies: Also keep the SAN of this many first mainline moves in
+      ScannedGame.moves
+    """
+    lines = iter(handle)
+    line = next(lines, "").lstrip("\ufeff")
+
+    while line:
+        # Ignore leading empty lines and comments
+        while line and (
+            line.isspace() or line.startswith("%") or line.startswith(";")
+        ):
+            line = next(lines, "")
+        if not line:
+            return
+
+        raw_lines = []
+        headers = dict(DEFAULT_HEADERS)
+
+        # Tag pairs, with at most one empty line between them
+        consecutive_empty_lines = 0
+        while line:
+            if line.startswith("%") or line.startswith(";"):
+                raw_lines.append(line)
+                line = next(lines, "")
+                continue
+            if consecutive_empty_lines < 1 and line.isspace():
+                consecutive_empty_lines += 1
+                raw_lines.append(line)
+                line = next(lines, "")
+                continue
+            if not line.startswith("["):
+                break
+            consecutive_empty_lines = 0
+            tag_match = TAG_REGEX.match(line)
+            if tag_match:
+                headers[tag_match.group(1)] = tag_match.group(2)
+            raw_lines.append(line)
+            line = next(lines, "")
+
+        # Movetext runs until an empty line outside of a comment
+        movetext_lines = []
+        in_comment = False
+        while line:
+            if not in_comment:
+                if line.isspace():
+                    break
+                if line.startswith("%") or line.startswith(";"):
+                    raw_lines.append(line)
+                    line = next(lines, "")
+                    continue
+            if in_comment or "{" in line:
+                for token in re.finditer(r";|\{|\}", line):
+                    token = token.group(0)
+                    if token == "{":
+                        in_comment = True
+                    elif not in_comment and token == ";":
+                        break
+                    elif token == "}":
+                        in_comment = False
+            movetext_lines.append(line)
+            line = next(lines, "")
+
+        moves = [] if opening_plies else None
+        scanned = count_plies(movetext_lines, moves, opening_plies)
+        if scanned is None:
+            raw_lines.extend(movetext_lines)
+            import chess.pgn
+
+            yield chess.pgn.read_game(io.StringIO("".join(raw_lines)))
+        else:
+            plies, result = scanned
+            # Like chess.pgn, the movetext result stands in for a missing one
+            if result is not None and headers["Result"] == "*":
+                headers["Result"] = result
+            yield ScannedGame(headers, plies, moves)
+
+
+def open_pgn(file_path, workers=None):
+    """
+    Open a PGN file for reading as text. Compressed files (.gz, .bz2, .zst,
+    detected from their magic bytes or extension) are decompressed on the fly.
+    - file_path: Path to the PGN file
+    - workers: Decompression threads for multi-stream bz2 and multi-frame zstd
+    """
+    from decompress import detect_format, open_binary
+
+    compression = detect_format(file_path)
+    if compression is None:
+        return open(file_path, "r")
+    return io.TextIOWrapper(
+        open_binary(file_path, compression, workers), encoding="utf-8"
+    )
+
+
+def iter_games(file_path, fast=False, compact=False, opening_plies=0):
+    """
+    Generator over the games of a PGN file, reading one game at a time.
+    - file_path: Path to the PGN file, optionally compressed
+    - fast: Use scan_games instead of building full python-chess games
+    - compact: Yield GameRecord objects, implies fast
+    - opening_plies: With fast, keep the first moves of each game (see scan_games)
+    """
+    with open_pgn(file_path) as file:
+        if compact:
+            for game in scan_games(file):
+                yield GameRecord.from_game(game)
+            return
+        if fast:
+            yield from scan_games(file, opening_plies)
+            return
+
+        import chess.pgn
+
         while True:
             game = chess.pgn.read_game(file)
             if game is None:
                 break
-            games.append(game)
-    return games
+            yield game
+
+
+def parse_pgn(file_path, fast=False, compact=False):
+    return list(iter_games(file_path, fast, compact))
+
+
+# Dates in RatingIndex are days since the Unix epoch, like numpy datetime64[D]
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+class RatingIndex:
+    """
+    Every rated game of the user per game type, as (day, rating) in game
+    order, built in one pass during analysis. Values are kept in compact
+    arrays and handed out as NumPy arrays by series.
+    """
+
+    __slots__ = ("days", "ratings")
+
+    def __init__(self):
+        self.days = {category: array("i") for category in GAME_TYPE_MAP.values()}
+        self.ratings = {category: array("i") for category in GAME_TYPE_MAP.values()}
+
+    def __eq__(self, other):
+        if not isinstance(other, RatingIndex):
+            return NotImplemented
+        return self.days == other.days and self.ratings == other.ratings
+
+    def __len__(self):
+        return sum(len(days) for days in self.days.values())
+
+    def add(self, category, date, rating):
+        self.days[category].append(date.toordinal() - EPOCH_ORDINAL)
+        self.ratings[category].append(rating)
+
+    def extend(self, other):
+        # Append the points of a later run of games, used by merge_stats
+        for category in self.days:
+            self.days[category].extend(other.days[category])
+            self.ratings[category].extend(other.ratings[category])
+
+    def series(self, category):
+        """
+        (dates, ratings) of a game type as datetime64[D] and int32 arrays,
+        sorted by date. Games of the same day keep their order in the file.
+        """
+        import numpy as np
+
+        days = np.frombuffer(self.days[category], dtype=np.int32)
+        ratings = np.frombuffer(self.ratings[category], dtype=np.int32)
+        order = np.argsort(days, kind="stable")
+        return days[order].astype("datetime64[D]"), ratings[order]
+
+    def to_dict(self):
+        return {
+            category: {
+                "days": self.days[category].tolist(),
+                "ratings": self.ratings[category].tolist(),
+            }
+            for category in self.days
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        for category, series in data.items():
+            index.days[category] = array("i", series["days"])
+            index.ratings[category] = array("i", series["ratings"])
+        return index
+
+
+# Record field counted for each result, from the point of view of White
+RESULT_OUTCOMES = {"1-0": "wins", "0-1": "losses", "1/2-1/2": "draws"}
+
+
+def game_outcome(result, white_player, black_player, username):
+    """
+    (outcome, color) of a game as add_game counts it: "wins", "losses",
+    "draws" or None for undecided games, and the color ("White" or "Black")
+    the game is credited to.
+    """
+    if result == "1-0":
+        return ("wins", "White") if white_player == username else ("losses", "Black")
+    if result == "0-1":
+        return ("wins", "Black") if black_player == username else ("losses", "White")
+    color = "White" if white_player == username else "Black"
+    return ("draws" if result == "1/2-1/2" else None), color
+
+
+# Per-day buckets of stats["daily"]: these fields for every game type and
+# color, starting at DAILY_OFFSETS[category][color]
+DAILY_FIELDS = ("games", "wins", "losses", "draws", "rating_change")
+DAILY_CATEGORIES = ("Bullet", "Blitz", "Rapid", "Classical")
+DAILY_COLORS = ("White", "Black")
+DAILY_OFFSETS = {
+    category: {
+        color: (index * len(DAILY_COLORS) + side) * len(DAILY_FIELDS)
+        for side, color in enumerate(DAILY_COLORS)
+    }
+    for index, category in enumerate(DAILY_CATEGORIES)
+}
+DAILY_OUTCOMES = {"wins": 1, "losses": 2, "draws": 3}
+DAILY_ZEROS = [0] * (len(DAILY_CATEGORIES) * len(DAILY_COLORS) * len(DAILY_FIELDS))
+
+
+# Named factories instead of lambdas so stats can be pickled between processes
+def new_record():
+    return {"wins": 0, "losses": 0, "draws": 0}
+
 
+def new_month():
+    return {"games": 0, "wins": 0, "rating_change": 0}
 
-def analyze_games(games, username):
+
+def new_lengths():
+    # Game lengths in constant memory: every game counts towards the overall
+    # average, and per result the games of more than one ply (the ones
+    # display_stats reports) as [count, sum, min, max]
+    return {"games": 0, "total": 0, "results": {}}
+
+
+def new_stats(sketch=None):
+    """
+    Empty stats for add_game.
+    - sketch: None for exact stats, or options of sketches.sketch_tables
+      (a dict, possibly empty) to keep openings, opponents and game lengths
+      in bounded memory
+    """
     stats = {
         "game_types": Counter(),
         "results": {"wins": 0, "losses": 0, "draws": 0},
-        "ratings": {"Bullet": [], "Blitz": [], "Rapid": [], "Classical": []},
-        "dates": {"Bullet": [], "Blitz": [], "Rapid": [], "Classical": []},
+        "ratings": RatingIndex(),
         "openings": Counter(),
-        "opening_success": defaultdict(lambda: {"wins": 0, "losses": 0, "draws": 0}),
+        "opening_success": defaultdict(new_record),
         "color_stats": {
             "White": {"wins": 0, "losses": 0, "draws": 0},
             "Black": {"wins": 0, "losses": 0, "draws": 0},
         },
         "streaks": {"win_streak": 0, "loss_streak": 0, "draw_streak": 0},
-        "game_lengths": [],
-        "monthly_performance": defaultdict(
-            lambda: {"games": 0, "wins": 0, "rating_change": 0}
-        ),
-        "head_to_head": defaultdict(lambda: {"wins": 0, "losses": 0, "draws": 0}),
+        "game_lengths": new_lengths(),
+        "monthly_performance": defaultdict(new_month),
+        # Days since the epoch -> array of DAILY_FIELDS per game type and color
+        "daily": {},
+        "head_to_head": defaultdict(new_record),
+        "current_streak": {"wins": 0, "losses": 0, "draws": 0},
+        "first_streak": {"wins": 0, "losses": 0, "draws": 0},
+        # Games with a time control or date that does not parse, by field
+        "malformed": Counter(),
     }
+    if sketch is not None:
+        from sketches import sketch_tables
 
-    current_streak = {"wins": 0, "losses": 0, "draws": 0}
+        stats.update(sketch_tables(**sketch))
+        stats["sketch"] = dict(sketch)
+    return stats
 
-    for game in games:
-        headers = game.headers
-        time_control = headers.get("TimeControl", "Unknown")
+
+def add_game(stats, game, username):
+    """
+    Fold a single game into stats, so games can be analyzed as they are read.
+    - stats: Dict returned by new_stats
+    - game: chess.pgn.Game or ScannedGame
+    - username: The username of the player whose games are being analyzed
+    """
+    headers = game.headers
+    current_streak = stats["current_streak"]
+    time_control = headers.get("TimeControl", "Unknown")
+    try:
         category = categorize_time_control(time_control)
-        stats["game_types"][category] += 1
-
-        result = headers.get("Result", "*")
-        white_player = headers["White"]
-        black_player = headers["Black"]
-
-        # Track results by color
-        if result == "1-0":
-            if white_player == username:
-                stats["results"]["wins"] += 1
-                stats["color_stats"]["White"]["wins"] += 1
-                current_streak["wins"] += 1
-                current_streak["losses"] = 0
-                current_streak["draws"] = 0
-            else:
-                stats["results"]["losses"] += 1
-                stats["color_stats"]["Black"]["losses"] += 1
-                current_streak["losses"] += 1
-                current_streak["wins"] = 0
-                current_streak["draws"] = 0
-        elif result == "0-1":
-            if black_player == username:
-                stats["results"]["wins"] += 1
-                stats["color_stats"]["Black"]["wins"] += 1
-                current_streak["wins"] += 1
-                current_streak["losses"] = 0
-                current_streak["draws"] = 0
-            else:
-                stats["results"]["losses"] += 1
-                stats["color_stats"]["White"]["losses"] += 1
-                current_streak["losses"] += 1
-                current_streak["wins"] = 0
-                current_streak["draws"] = 0
-        elif result == "1/2-1/2":
-            stats["results"]["draws"] += 1
-            if white_player == username:
-                stats["color_stats"]["White"]["draws"] += 1
-            else:
-                stats["color_stats"]["Black"]["draws"] += 1
-            current_streak["draws"] += 1
-            current_streak["wins"] = 0
-            current_streak["losses"] = 0
-
-        # Track streaks
-        if current_streak["wins"] > stats["streaks"]["win_streak"]:
-            stats["streaks"]["win_streak"] = current_streak["wins"]
-        if current_streak["losses"] > stats["streaks"]["loss_streak"]:
-            stats["streaks"]["loss_streak"] = current_streak["losses"]
-        if current_streak["draws"] > stats["streaks"]["draw_streak"]:
-            stats["streaks"]["draw_streak"] = current_streak["draws"]
-
-        # Track monthly performance
-        date = headers.get("Date", "????.??.??")
-        try:
-            date = datetime.strptime(date, "%Y.%m.%d")
-            month_stats = stats["monthly_performance"].setdefault(
-                date.month, {"games": 0, "wins": 0, "rating_change": 0}
-            )
-            month_stats["games"] += 1
+    except ValueError:
+        # Correspondence ("-"), unlimited or missing time control, skip the game
+        stats["malformed"]["time_control"] += 1
+        return
+    stats["game_types"][category] += 1
+
+    result = headers.get("Result", "*")
+    white_player = headers["White"]
+    black_player = headers["Black"]
+
+    # Track results by color
+    outcome, color = game_outcome(result, white_player, black_player, username)
+    if outcome is not None:
+        stats["results"][outcome] += 1
+        stats["color_stats"][color][outcome] += 1
+        streak = current_streak[outcome] + 1
+        current_streak["wins"] = current_streak["losses"] = current_streak["draws"] = 0
+        current_streak[outcome] = streak
+
+    # Track streaks
+    if current_streak["wins"] > stats["streaks"]["win_streak"]:
+        stats["streaks"]["win_streak"] = current_streak["wins"]
+    if current_streak["losses"] > stats["streaks"]["loss_streak"]:
+        stats["streaks"]["loss_streak"] = current_streak["losses"]
+    if current_streak["draws"] > stats["streaks"]["draw_streak"]:
+        stats["streaks"]["draw_streak"] = current_streak["draws"]
+
+    # Keep the opening run while every decided game so far belongs to it,
+    # merge_stats needs it to join streaks across stats
+    if sum(current_streak.values()) == sum(stats["results"].values()):
+        stats["first_streak"].update(current_streak)
+
+    # Track monthly performance
+    date = headers.get("Date", "????.??.??")
+    try:
+        date = parse_date(date)
+    except ValueError:
+        # Counted, but left out of the monthly and rating progression stats
+        stats["malformed"]["date"] += 1
+    else:
+        month_stats = stats["monthly_performance"].setdefault(
+            date.month, {"games": 0, "wins": 0, "rating_change": 0}
+        )
+        month_stats["games"] += 1
 
+        try:
             if result == "1-0" and white_player == username:
                 month_stats["wins"] += 1
-                month_stats["rating_change"] += int(headers.get("WhiteRatingDiff", "0"))
+                month_stats["rating_change"] += int(
+                    headers.get("WhiteRatingDiff", "0")
+                )
             elif result == "0-1" and black_player == username:
                 month_stats["wins"] += 1
-                month_stats["rating_change"] += int(headers.get("BlackRatingDiff", "0"))
-
+                month_stats["rating_change"] += int(
+                    headers.get("BlackRatingDiff", "0")
+                )
         except ValueError:
             pass
 
-        # Track game length (number of moves)
-        game_length = len(list(game.mainline_moves()))  # Corrected line
-        stats["game_lengths"].append(
-            (game_length, result)
-        )  # Store as tuple of (game_length, result)
+        # Per-day tallies by game type and color, for date-range queries
+        day = date.toordinal() - EPOCH_ORDINAL
+        bucket = stats["daily"].get(day)
+        if bucket is None:
+            bucket = stats["daily"][day] = array("i", DAILY_ZEROS)
+        offset = DAILY_OFFSETS[category][color]
+        bucket[offset] += 1
+        if outcome is not None:
+            bucket[offset + DAILY_OUTCOMES[outcome]] += 1
+        if white_player == username:
+            rating_diff = headers.get("WhiteRatingDiff")
+        elif black_player == username:
+            rating_diff = headers.get("BlackRatingDiff")
+        else:
+            rating_diff = None
+        if rating_diff:
+            try:
+                bucket[offset + 4] += int(rating_diff)
+            except ValueError:
+                pass
 
-        # Track head-to-head
+    # Track rating progression, every rated game with a valid date
+    if white_player == username:
+        rating = headers.get("WhiteElo", None)
+    elif black_player == username:
+        rating = headers.get("BlackElo", None)
+    else:
+        rating = None
+    if rating and isinstance(date, datetime):
+        try:
+            rating = int(rating)
+        except ValueError:
+            pass  # Skip unparseable ratings
+        else:
+            stats["ratings"].add(category, date, rating)
+
+    if "sketch" in stats:
+        # Bounded-memory tables, same keys and order as long as nothing is evicted
+        outcome = RESULT_OUTCOMES.get(result)
+        stats["game_lengths"].add(mainline_length(game), result)
         opponent = white_player if black_player == username else black_player
         if opponent:
-            stats["head_to_head"][opponent]["wins"] += 1 if result == "1-0" else 0
-            stats["head_to_head"][opponent]["losses"] += 1 if result == "0-1" else 0
-            stats["head_to_head"][opponent]["draws"] += 1 if result == "1/2-1/2" else 0
+            stats["head_to_head"].add(opponent, outcome)
+        # opening_success is the same table as openings
+        stats["openings"].add(headers.get("Opening", "Unknown"), outcome)
+        return
+
+    # Track game length (number of moves)
+    game_length = mainline_length(game)
+    lengths = stats["game_lengths"]
+    lengths["games"] += 1
+    lengths["total"] += game_length
+    if game_length > 1:
+        summary = lengths["results"].get(result)
+        if summary is None:
+            lengths["results"][result] = [1, game_length, game_length, game_length]
+        else:
+            summary[0] += 1
+            summary[1] += game_length
+            if game_length < summary[2]:
+                summary[2] = game_length
+            if game_length > summary[3]:
+                summary[3] = game_length
+
+    # Track head-to-head
+    opponent = white_player if black_player == username else black_player
+    if opponent:
+        stats["head_to_head"][opponent]["wins"] += 1 if result == "1-0" else 0
+        stats["head_to_head"][opponent]["losses"] += 1 if result == "0-1" else 0
+        stats["head_to_head"][opponent]["draws"] += 1 if result == "1/2-1/2" else 0
+
+    # Track openings
+    opening = headers.get("Opening", "Unknown")
+    stats["openings"][opening] += 1
+    stats["opening_success"][opening]["wins"] += 1 if result == "1-0" else 0
+    stats["opening_success"][opening]["losses"] += 1 if result == "0-1" else 0
+    stats["opening_success"][opening]["draws"] += 1 if result == "1/2-1/2" else 0
+
+
+def analyze_games(games, username, sketch=None):
+    stats = new_stats(sketch)
+    for game in games:
+        add_game(stats, game, username)
+    return stats
 
-        # Track openings
-        opening = headers.get("Opening", "Unknown")
-        stats["openings"][opening] += 1
-        stats["opening_success"][opening]["wins"] += 1 if result == "1-0" else 0
-        stats["opening_success"][opening]["losses"] += 1 if result == "0-1" else 0
-        stats["opening_success"][opening]["draws"] += 1 if result == "1/2-1/2" else 0
+
+def _streak_kind(streak):
+    # The outcome a run counts ("wins", "losses" or "draws"), None when empty
+    for kind, length in streak.items():
+        if length:
+            return kind
+    return None
+
+
+def merge_stats(stats, other):
+    """
+    Merge the stats of a later run of games into stats, as if the games had
+    been analyzed in one pass. Streaks running across the boundary are joined
+    using the current streak of stats and the first streak of other.
+    - stats: Dict returned by analyze_games, updated in place and returned
+    - other: Stats of the games that follow those of stats
+    """
+    stats["game_types"].update(other["game_types"])
+    for key in ("wins", "losses", "draws"):
+        stats["results"][key] += other["results"][key]
+        for color in ("White", "Black"):
+            stats["color_stats"][color][key] += other["color_stats"][color][key]
+
+    stats["ratings"].extend(other["ratings"])
+
+    if ("sketch" in stats) != ("sketch" in other):
+        raise ValueError("Cannot merge sketched and exact stats")
+    if "sketch" in stats:
+        for key in ("openings", "head_to_head", "game_lengths"):
+            stats[key].merge(other[key])
+    else:
+        stats["openings"].update(other["openings"])
+        for table in ("opening_success", "head_to_head"):
+            for key, record in other[table].items():
+                merged = stats[table][key]
+                for outcome, count in record.items():
+                    merged[outcome] += count
+        lengths, theirs = stats["game_lengths"], other["game_lengths"]
+        lengths["games"] += theirs["games"]
+        lengths["total"] += theirs["total"]
+        for result, (count, total, shortest, longest) in theirs["results"].items():
+            summary = lengths["results"].get(result)
+            if summary is None:
+                lengths["results"][result] = [count, total, shortest, longest]
+            else:
+                summary[0] += count
+                summary[1] += total
+                summary[2] = min(summary[2], shortest)
+                summary[3] = max(summary[3], longest)
+
+    for month, record in other["monthly_performance"].items():
+        merged = stats["monthly_performance"][month]
+        for key, value in record.items():
+            merged[key] += value
+
+    for day, bucket in other["daily"].items():
+        merged = stats["daily"].get(day)
+        if merged is None:
+            stats["daily"][day] = array("i", bucket)
+        else:
+            for index, value in enumerate(bucket):
+                merged[index] += value
+
+    stats["malformed"].update(other["malformed"])
+
+    # Streaks: a run can end one side of the boundary and continue on the other
+    tail, head = stats["current_streak"], other["first_streak"]
+    tail_kind, head_kind = _streak_kind(tail), _streak_kind(head)
+    decided = sum(stats["results"].values()) - sum(other["results"].values())
+    other_decided = sum(other["results"].values())
+    longest = {
+        "wins": "win_streak",
+        "losses": "loss_streak",
+        "draws": "draw_streak",
+    }
+    for kind, key in longest.items():
+        stats["streaks"][key] = max(stats["streaks"][key], other["streaks"][key])
+    if tail_kind is not None and tail_kind == head_kind:
+        joined = tail[tail_kind] + head[head_kind]
+        key = longest[tail_kind]
+        stats["streaks"][key] = max(stats["streaks"][key], joined)
+        # A single run on either side extends the first or current streak
+        if sum(stats["first_streak"].values()) == decided:
+            stats["first_streak"][tail_kind] = joined
+        if sum(other["current_streak"].values()) == other_decided:
+            tail[tail_kind] = joined
+        else:
+            stats["current_streak"] = dict(other["current_streak"])
+    else:
+        if decided == 0:
+            stats["first_streak"] = dict(head)
+        if other_decided:
+            stats["current_streak"] = dict(other["current_streak"])
 
     return stats
 
 
+def _copy_lengths(lengths):
+    return {
+        "games": lengths["games"],
+        "total": lengths["total"],
+        "results": {
+            result: list(summary) for result, summary in lengths["results"].items()
+        },
+    }
+
+
+def stats_to_dict(stats):
+    """
+    Convert stats to plain JSON-serializable types. Key order is kept, so
+    stats_from_dict restores the same first-seen ordering display_stats uses.
+    """
+    data = {}
+    for key, value in stats.items():
+        if key == "opening_success" and value is stats["openings"]:
+            continue  # Sketched, the openings table holds the records
+        if hasattr(value, "to_dict"):
+            value = value.to_dict()  # RatingIndex and sketches
+        elif key == "game_lengths":
+            value = _copy_lengths(value)
+        elif key == "monthly_performance":
+            value = {str(month): dict(record) for month, record in value.items()}
+        elif key == "daily":
+            value = {str(day): bucket.tolist() for day, bucket in value.items()}
+        elif isinstance(value, dict):
+            value = {
+                name: dict(entry) if isinstance(entry, dict) else entry
+                for name, entry in value.items()
+            }
+        data[key] = value
+    return data
+
+
+def stats_from_dict(data):
+    """
+    Rebuild stats saved with stats_to_dict.
+    """
+    stats = new_stats(data.get("sketch"))
+    for key, value in data.items():
+        if hasattr(stats.get(key), "from_dict"):
+            value = type(stats[key]).from_dict(value)  # RatingIndex and sketches
+        elif key == "game_lengths":
+            value = _copy_lengths(value)
+        elif key == "monthly_performance":
+            value = defaultdict(
+                new_month, {int(month): record for month, record in value.items()}
+            )
+        elif key == "daily":
+            value = {int(day): array("i", bucket) for day, bucket in value.items()}
+        elif isinstance(stats.get(key), Counter):
+            value = Counter(value)
+        elif isinstance(stats.get(key), defaultdict):
+            value = defaultdict(stats[key].default_factory, value)
+        stats[key] = value
+    if "sketch" in stats:
+        stats["opening_success"] = stats["openings"]
+    return stats
+
+
 # Function to visualize Monthly Performance
-def plot_monthly_performance(monthly_performance):
+def draw_monthly_performance(fig, monthly_performance):
+    """
+    Draw the monthly performance chart on an empty figure.
+    """
     # Define month names
     month_names = [
         "Jan",
@@ -187,8 +860,8 @@ def plot_monthly_performance(monthly_performance):
         for month in sorted(monthly_performance.keys())
     ]
 
-    # Create a figure with two subplots: one for win rate and one for games/wins
-    fig, ax1 = plt.subplots(figsize=(10, 6))
+    # Two y-axes: one for win rate and one for games/wins
+    ax1 = fig.add_subplot()
 
     # Plot Win Rate per Month
     ax1.set_xlabel("Month")
@@ -212,12 +885,19 @@ def plot_monthly_performance(monthly_performance):
     ax2.tick_params(axis="y", labelcolor="tab:green")
 
     # Title and grid
-    plt.title("Monthly Performance: Win Rate, Games Played, and Wins")
+    ax2.set_title("Monthly Performance: Win Rate, Games Played, and Wins")
     fig.tight_layout()  # Ensure no overlap of labels
     ax1.legend(loc="upper left", bbox_to_anchor=(0.1, 1), fontsize="small")
     ax2.legend(loc="upper right", bbox_to_anchor=(0.9, 1), fontsize="small")
-    plt.xticks(rotation=45)
-    plt.grid(True)
+    ax2.tick_params(axis="x", labelrotation=45)
+    ax2.grid(True)
+
+
+def plot_monthly_performance(monthly_performance):
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(10, 6))
+    draw_monthly_performance(fig, monthly_performance)
     plt.show()
 
 
@@ -228,6 +908,9 @@ GAME_TYPE_MAP = {1: "Bullet", 2: "Blitz", 3: "Rapid", 4: "Classical"}
 # Default maximum number of games to consider if not specified
 DEFAULT_MAX_GAMES = 1000
 
+# Points drawn in the rating progression chart, longer series are downsampled
+DEFAULT_MAX_POINTS = 1000
+
 
 def get_rating_progression(
     games, username, game_type_number, max_games=DEFAULT_MAX_GAMES
@@ -255,8 +938,11 @@ def get_rating_progression(
         time_control = headers.get("TimeControl", "Unknown")
 
         # Skip games that are not of the selected type
-        if game_type not in categorize_time_control(time_control):
-            continue
+        try:
+            if game_type not in categorize_time_control(time_control):
+                continue
+        except ValueError:
+            continue  # Skip time controls without a category
 
         # Initialize rating variable
         rating = None
@@ -275,7 +961,7 @@ def get_rating_progression(
 
         if rating and date != "????.??.??":
             try:
-                date_obj = datetime.strptime(date, "%Y.%m.%d")
+                date_obj = parse_date(date)
                 dates.append(date_obj)
                 ratings.append(int(rating))
                 games_processed += 1
@@ -290,76 +976,241 @@ def get_rating_progression(
 
 
 # Function to plot rating progression
-def plot_rating_progression(dates, ratings, game_type):
-    if not dates or not ratings:
+def draw_rating_progression(
+    fig, dates, ratings, game_type, max_points=DEFAULT_MAX_POINTS, method="lttb"
+):
+    """
+    Draw a rating series on an empty figure, downsampled to max_points when
+    it is longer. Returns False, drawing nothing, when the series is empty.
+    - dates, ratings: Lists or arrays, as from get_rating_progression or
+      RatingIndex.series
+    - method: "lttb" (Largest-Triangle-Three-Buckets) or "minmax"
+    """
+    if len(dates) == 0 or len(ratings) == 0:
+        return False
+
+    if max_points and len(ratings) > max_points:
+        import numpy as np
+        from downsample import downsample
+
+        dates, ratings = downsample(
+            np.asarray(dates, dtype="datetime64[D]"),
+            np.asarray(ratings),
+            max_points,
+            method,
+        )
+
+    ax = fig.add_subplot()
+    ax.plot(dates, ratings, marker="o", color="blue", label=game_type)
+    ax.set_title(f"Rating Progression ({game_type})")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Rating")
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.grid(True)
+    ax.legend()
+    fig.tight_layout()
+    return True
+
+
+def plot_rating_progression(
+    dates, ratings, game_type, max_points=DEFAULT_MAX_POINTS, method="lttb"
+):
+    if len(dates) == 0 or len(ratings) == 0:
         print("No Stats Available")
         return
 
-    plt.figure(figsize=(10, 6))
-    plt.plot(dates, ratings, marker="o", color="blue", label=game_type)
-    plt.title(f"Rating Progression ({game_type})")
-    plt.xlabel("Date")
-    plt.ylabel("Rating")
-    plt.xticks(rotation=45)
-    plt.grid(True)
-    plt.legend()
-    plt.tight_layout()
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(10, 6))
+    draw_rating_progression(fig, dates, ratings, game_type, max_points, method)
     plt.show()
 
 
-def display_stats(stats, games, username):
+def display_length_sketch(lengths):
+    # display_result_distribution_by_game_length for a sketches.LengthSketch
+    print("\nResult Distribution by Game Length (average moves):")
+    for result, name in (("1-0", "wins"), ("0-1", "losses"), ("1/2-1/2", "draws")):
+        print(f"Average length of {name}: {lengths.mean(result):.2f} moves")
+
+    for result, name in (("1-0", "win"), ("0-1", "loss"), ("1/2-1/2", "draw")):
+        if lengths.minimum(result) is not None:
+            print(f"Shortest {name}: {lengths.minimum(result)} moves")
+        if lengths.maximum(result) is not None:
+            print(f"Longest {name}: {lengths.maximum(result)} moves")
+        if lengths.minimum(result) is not None:
+            print(f"Median {name}: ~{lengths.quantile(result, 0.5):.0f} moves")
+
+
+MONTH_NAMES = (
+    "Jan",
+    "Feb",
+    "Mar",
+    "Apr",
+    "May",
+    "Jun",
+    "Jul",
+    "Aug",
+    "Sep",
+    "Oct",
+    "Nov",
+    "Dec",
+)
+
+
+def summary_tables(stats):
+    """
+    The tables display_stats prints, as JSON-ready data: top openings,
+    colors, streaks, months, opponents and game lengths. lengths is None
+    for sketched stats, which display_length_sketch shows instead.
+    """
+    total_games = sum(stats["game_types"].values())
+    success = stats["opening_success"]
+
+    def opening_row(opening):
+        record = success[opening]
+        games = sum(record.values())
+        return {
+            "opening": opening,
+            "games": games,
+            "wins": record["wins"],
+            "success_rate": record["wins"] / games if games > 0 else 0,
+        }
+
+    by_wins = sorted(success.items(), key=lambda item: item[1]["wins"], reverse=True)
+    by_rate = [
+        (opening, record["wins"] / sum(record.values()))
+        for opening, record in success.items()
+        if sum(record.values()) > 0
+    ]
+    by_rate.sort(key=lambda item: item[1], reverse=True)
+    by_losses = sorted(
+        success.items(), key=lambda item: item[1]["losses"], reverse=True
+    )
+    opponents = sorted(
+        stats["head_to_head"].items(),
+        key=lambda item: sum(item[1].values()),
+        reverse=True,
+    )
+
+    if "sketch" in stats:
+        lengths = None
+        sketch = stats["game_lengths"]
+        average_moves = sketch.mean() if sketch.games else None
+    else:
+        # Count, sum, min and max of the games longer than one move, by result
+        game_lengths = stats["game_lengths"]
+        lengths = {}
+        for name, result in (("wins", "1-0"), ("losses", "0-1"), ("draws", "1/2-1/2")):
+            count, total, shortest, longest = game_lengths["results"].get(
+                result, (0, 0, None, None)
+            )
+            lengths[name] = {
+                "average": total / count if count else 0,
+                "shortest": shortest,
+                "longest": longest,
+            }
+        average_moves = (
+            game_lengths["total"] / game_lengths["games"]
+            if game_lengths["games"]
+            else None
+        )
+
+    return {
+        "game_types": dict(stats["game_types"]),
+        "skipped": stats["malformed"]["time_control"],
+        "results": dict(stats["results"], total=total_games),
+        "top_openings": [
+            dict(opening_row(opening), count=count)
+            for opening, count in stats["openings"].most_common(5)
+        ],
+        "openings_by_wins": [opening_row(opening) for opening, _ in by_wins[:5]],
+        "openings_by_win_rate": [opening_row(opening) for opening, _ in by_rate[:5]],
+        "colors": {
+            color: dict(record) for color, record in stats["color_stats"].items()
+        },
+        "streaks": dict(stats["streaks"]),
+        "struggles": [
+            {"opening": opening, "losses": record["losses"]}
+            for opening, record in by_losses[:5]
+        ],
+        "lengths": lengths,
+        "monthly": {
+            MONTH_NAMES[month - 1]: dict(stats["monthly_performance"][month])
+            for month in sorted(stats["monthly_performance"])
+        },
+        "head_to_head": [
+            dict(record, opponent=opponent, games=sum(record.values()))
+            for opponent, record in opponents[:5]
+        ],
+        "average_moves": average_moves,
+    }
+
+
+def display_stats(
+    stats,
+    games=None,
+    username=None,
+    output_dir=None,
+    image_format="png",
+    game_type_number=None,
+    charts=True,
+):
+    """
+    Print the analysis and plot the charts.
+    - stats: Dict returned by analyze_games
+    - games: Optional list of games, to rebuild the rating progression from
+      instead of the points analyze_games collected
+    - username: Required together with games
+    - output_dir: Save every chart there (Agg backend) instead of showing
+      them, without asking for a game type
+    - image_format: "png" or "svg", with output_dir
+    - game_type_number: Rating progression to show (1-4) instead of asking
+    - charts: False to only print the text stats
+    """
+
+    tables = summary_tables(stats)
 
     print("\nGame Breakdown:")
-    for game_type, count in stats["game_types"].items():
+    for game_type, count in tables["game_types"].items():
         print(f"{game_type}: {count}")
+    if tables["skipped"]:
+        print(
+            f"Skipped {tables['skipped']} games without a "
+            "Bullet/Blitz/Rapid/Classical time control"
+        )
 
-    total_games = sum(stats["game_types"].values())
+    results = tables["results"]
+    total_games = results["total"]
     print("\nGame Results:")
     print(f"Total Games: {total_games}")
-    print(
-        f"Wins: {stats['results']['wins']} ({stats['results']['wins'] / total_games:.2%})"
-    )
-    print(
-        f"Losses: {stats['results']['losses']} ({stats['results']['losses'] / total_games:.2%})"
-    )
-    print(
-        f"Draws: {stats['results']['draws']} ({stats['results']['draws'] / total_games:.2%})"
-    )
+    print(f"Wins: {results['wins']} ({results['wins'] / total_games:.2%})")
+    print(f"Losses: {results['losses']} ({results['losses'] / total_games:.2%})")
+    print(f"Draws: {results['draws']} ({results['draws'] / total_games:.2%})")
 
     print("\nTop 5 Most Played Openings:")
-    for opening, count in stats["openings"].most_common(5):
-        wins = stats["opening_success"][opening]["wins"]
-        total = sum(stats["opening_success"][opening].values())
-        success_rate = wins / total if total > 0 else 0
-        print(f"{opening}: {count} games, {wins} wins, {success_rate:.2%} success rate")
+    for row in tables["top_openings"]:
+        print(
+            f"{row['opening']}: {row['count']} games, {row['wins']} wins, "
+            f"{row['success_rate']:.2%} success rate"
+        )
 
     print("\nTop 5 Most Successful Openings by Wins:")
-    success_rates = sorted(
-        stats["opening_success"].items(), key=lambda item: item[1]["wins"], reverse=True
-    )
-    for opening, success in success_rates[:5]:
-        wins = success["wins"]
-        total = sum(success.values())
-        print(f"{opening}: {total} games, {wins} wins, {wins / total:.2%} success rate")
+    for row in tables["openings_by_wins"]:
+        print(
+            f"{row['opening']}: {row['games']} games, {row['wins']} wins, "
+            f"{row['success_rate']:.2%} success rate"
+        )
 
     print("\nTop 5 Most Successful Openings by Win Percentage:")
-    success_rates = [
-        (
-            opening,
-            success["wins"] / (success["wins"] + success["losses"] + success["draws"]),
+    for row in tables["openings_by_win_rate"]:
+        print(
+            f"{row['opening']}: {row['games']} games, {row['wins']} wins, "
+            f"{row['success_rate']:.2%} success rate"
         )
-        for opening, success in stats["opening_success"].items()
-        if (success["wins"] + success["losses"] + success["draws"]) > 0
-    ]
-    success_rates.sort(key=lambda x: x[1], reverse=True)
-    for opening, rate in success_rates[:5]:
-        wins = stats["opening_success"][opening]["wins"]
-        total = sum(stats["opening_success"][opening].values())
-        print(f"{opening}: {total} games, {wins} wins, {rate:.2%} success rate")
 
     # Performance by Color
     print("\nPerformance by Color:")
-    for color, record in stats["color_stats"].items():
+    for color, record in tables["colors"].items():
         total_games = sum(record.values())
         win_rate = record["wins"] / total_games if total_games > 0 else 0
         loss_rate = record["losses"] / total_games if total_games > 0 else 0
@@ -373,136 +1224,73 @@ def display_stats(stats, games, username):
 
     # Streaks
     print("\nLongest Streaks:")
-    print(f"Longest Win Streak: {stats['streaks']['win_streak']}")
-    print(f"Longest Loss Streak: {stats['streaks']['loss_streak']}")
-    print(f"Longest Draw Streak: {stats['streaks']['draw_streak']}")
+    print(f"Longest Win Streak: {tables['streaks']['win_streak']}")
+    print(f"Longest Loss Streak: {tables['streaks']['loss_streak']}")
+    print(f"Longest Draw Streak: {tables['streaks']['draw_streak']}")
 
     # Openings You Struggle With (based on loss rate)
     print("\nOpenings You Struggle With (by Losses):")
-    sorted_openings = sorted(
-        stats["opening_success"].items(),
-        key=lambda item: item[1]["losses"],
-        reverse=True,
-    )
-    for opening, success in sorted_openings[:5]:
-        print(f"{opening}: {success['losses']} losses")
+    for row in tables["struggles"]:
+        print(f"{row['opening']}: {row['losses']} losses")
 
     # Result Distribution by Game Length
-    def display_result_distribution_by_game_length(stats):
-        # Extract game lengths for each result type (win, loss, draw)
-        win_lengths = [
-            length for length, result in stats["game_lengths"] if result == "1-0"
-        ]
-        loss_lengths = [
-            length for length, result in stats["game_lengths"] if result == "0-1"
-        ]
-        draw_lengths = [
-            length for length, result in stats["game_lengths"] if result == "1/2-1/2"
-        ]
-
-        # Filter out the game lengths that are 1 move
-        win_lengths = [length for length in win_lengths if length > 1]
-        loss_lengths = [length for length in loss_lengths if length > 1]
-        draw_lengths = [length for length in draw_lengths if length > 1]
-
-        # Calculate the averages
-        avg_win_length = np.mean(win_lengths) if win_lengths else 0
-        avg_loss_length = np.mean(loss_lengths) if loss_lengths else 0
-        avg_draw_length = np.mean(draw_lengths) if draw_lengths else 0
-
-        # Find the shortest and longest game lengths
-        shortest_win = min(win_lengths) if win_lengths else None
-        longest_win = max(win_lengths) if win_lengths else None
-        shortest_loss = min(loss_lengths) if loss_lengths else None
-        longest_loss = max(loss_lengths) if loss_lengths else None
-        shortest_draw = min(draw_lengths) if draw_lengths else None
-        longest_draw = max(draw_lengths) if draw_lengths else None
-
-        # Display result distribution by game length
+    if tables["lengths"] is None:
+        display_length_sketch(stats["game_lengths"])
+    else:
+        lengths = tables["lengths"]
         print("\nResult Distribution by Game Length (average moves):")
-        print(f"Average length of wins: {avg_win_length:.2f} moves")
-        print(f"Average length of losses: {avg_loss_length:.2f} moves")
-        print(f"Average length of draws: {avg_draw_length:.2f} moves")
-
-        # Display shortest and longest game lengths for each result type
-        if shortest_win is not None:
-            print(f"Shortest win: {shortest_win} moves")
-        if longest_win is not None:
-            print(f"Longest win: {longest_win} moves")
-
-        if shortest_loss is not None:
-            print(f"Shortest loss: {shortest_loss} moves")
-        if longest_loss is not None:
-            print(f"Longest loss: {longest_loss} moves")
-
-        if shortest_draw is not None:
-            print(f"Shortest draw: {shortest_draw} moves")
-        if longest_draw is not None:
-            print(f"Longest draw: {longest_draw} moves")
-
-    display_result_distribution_by_game_length(stats)
-
-    # Monthly Performance
+        print(f"Average length of wins: {lengths['wins']['average']:.2f} moves")
+        print(f"Average length of losses: {lengths['losses']['average']:.2f} moves")
+        print(f"Average length of draws: {lengths['draws']['average']:.2f} moves")
+
+        # Shortest and longest game lengths for each result type
+        for name, label in (("wins", "win"), ("losses", "loss"), ("draws", "draw")):
+            if lengths[name]["shortest"] is not None:
+                print(f"Shortest {label}: {lengths[name]['shortest']} moves")
+            if lengths[name]["longest"] is not None:
+                print(f"Longest {label}: {lengths[name]['longest']} moves")
+
+    # Monthly Performance, in ascending month order
     print("\nMonthly Performance:")
-    # List of month names
-    month_names = [
-        "Jan",
-        "Feb",
-        "Mar",
-        "Apr",
-        "May",
-        "Jun",
-        "Jul",
-        "Aug",
-        "Sep",
-        "Oct",
-        "Nov",
-        "Dec",
-    ]
-
-    # Sort months in ascending order
-    for month in sorted(stats["monthly_performance"].keys()):
-        record = stats["monthly_performance"][month]
+    for month_name, record in tables["monthly"].items():
         win_rate = record["wins"] / record["games"] if record["games"] > 0 else 0
         print(
-            f"{month_names[month - 1]}: {record['games']} games, {record['wins']} wins, Win Rate: {win_rate:.2%}"
+            f"{month_name}: {record['games']} games, {record['wins']} wins, "
+            f"Win Rate: {win_rate:.2%}"
         )
 
     # Now plot the monthly performance data
-    plot_monthly_performance(stats["monthly_performance"])
+    if charts and output_dir is None:
+        plot_monthly_performance(stats["monthly_performance"])
 
-    # Head-to-Head Analysis
+    # Head-to-Head Analysis, the top 5 opponents by total number of games
     print("\nHead-to-Head Analysis:")
-    # Sort opponents by total number of games (wins + losses + draws)
-    sorted_head_to_head = sorted(
-        stats["head_to_head"].items(),
-        key=lambda item: sum(item[1].values()),  # Sort by total games
-        reverse=True,
-    )
-
-    # Display the top 5 opponents
-    for opponent, record in sorted_head_to_head[:5]:
-        total_games = sum(record.values())
-        win_rate = record["wins"] / total_games if total_games > 0 else 0
+    for record in tables["head_to_head"]:
+        win_rate = record["wins"] / record["games"] if record["games"] > 0 else 0
         print(
-            f"Against {opponent}: {total_games} total games, {record['wins']} wins, "
-            f"{record['losses']} losses, {record['draws']} draws, Win Rate: {win_rate:.2%}"
+            f"Against {record['opponent']}: {record['games']} total games, "
+            f"{record['wins']} wins, {record['losses']} losses, "
+            f"{record['draws']} draws, Win Rate: {win_rate:.2%}"
         )
 
     # Game Length Analysis (Number of Moves)
     print("\nGame Length Analysis (Number of Moves):")
-
-    # Extract only the game lengths (the first element of each tuple)
-    game_lengths = [length for length, _ in stats["game_lengths"]]
-
-    if game_lengths:
-        avg_moves = np.mean(
-            game_lengths
-        )  # Now calculating the mean of just the lengths (integers)
-        print(f"Average number of moves per game: {avg_moves}")
+    if tables["average_moves"] is not None:
+        print(f"Average number of moves per game: {tables['average_moves']}")
     else:
         print("No game lengths available.")
 
+    if not charts:
+        return
+
+    if output_dir is not None:
+        # Headless: render every chart to a file, nothing to ask or show
+        from render import render_charts
+
+        for path in render_charts(stats, output_dir, image_format):
+            print(f"Saved {path}")
+        return
+
     # Find the most played game type by checking the highest count in game_types
     most_played_game_type = stats["game_types"].most_common(1)
     if most_played_game_type:
@@ -511,9 +1299,12 @@ def display_stats(stats, games, username):
         most_played_game_type = "Blitz"  # Default to 'Blitz' if no games are played
 
     # Prompt for the game type to visualize rating progression
-    game_type_input = input(
-        "\nEnter the game type number to visualize rating progression (1: Bullet, 2: Blitz, 3: Rapid, 4: Classical): "
-    )
+    if game_type_number is None:
+        game_type_input = input(
+            "\nEnter the game type number to visualize rating progression (1: Bullet, 2: Blitz, 3: Rapid, 4: Classical): "
+        )
+    else:
+        game_type_input = str(game_type_number)
 
     # If the user doesn't enter anything, use the most played game type
     if game_type_input.strip() == "":
@@ -542,16 +1333,129 @@ def display_stats(stats, games, username):
                 "Classical": 4,
             }[most_played_game_type]
 
-    # Call the function to get rating progression
-    dates, ratings = get_rating_progression(games, username, game_type_number)
+    # Get the rating progression, the analysis already indexed it
     game_type_name = GAME_TYPE_MAP[game_type_number]
+    if games is None:
+        dates, ratings = stats["ratings"].series(game_type_name)
+    else:
+        dates, ratings = get_rating_progression(games, username, game_type_number)
     plot_rating_progression(dates, ratings, game_type_name)
 
 
-if __name__ == "__main__":
-    pgn_file = input("Enter the path to your PGN file: ")
-    username = input("Enter your Lichess Username: ")
+def main(argv=None):
+    """
+    Command-line entry point. Without arguments it asks for the PGN file and
+    username like it always did.
+    """
+    import argparse
+
+    game_types = {name.lower(): number for number, name in GAME_TYPE_MAP.items()}
+    parser = argparse.ArgumentParser(description="Lichess Year in Review")
+    parser.add_argument("pgn_file", nargs="?", help="PGN export, optionally compressed")
+    parser.add_argument("username", nargs="?")
+    parser.add_argument(
+        "--game-type",
+        choices=sorted(game_types, key=game_types.get),
+        help="Rating progression to plot (default: ask, or the most played)",
+    )
+    parser.add_argument("--format", choices=("text", "json"), default="text")
+    parser.add_argument(
+        "--stats-only", action="store_true", help="Print the stats, no charts"
+    )
+    parser.add_argument("--charts", metavar="DIR", help="Save all charts to DIR")
+    parser.add_argument("--image-format", choices=("png", "svg"), default="png")
+    parser.add_argument(
+        "--sketch",
+        action="store_true",
+        help="Bounded memory: approximate openings, opponents and game lengths",
+    )
+    parser.add_argument(
+        "--top-k-error",
+        type=float,
+        help="Sketch count error as a fraction of games (default: 0.001)",
+    )
+    parser.add_argument(
+        "--length-accuracy",
+        type=float,
+        help="Sketch relative error of game lengths (default: 0.01)",
+    )
+    parser.add_argument(
+        "--fetch",
+        metavar="USERNAME",
+        help="Download the games of USERNAME from Lichess instead of a PGN file",
+    )
+    parser.add_argument(
+        "--state-dir",
+        help="With --fetch, keep the stats here and only download new games",
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help="Keep the parsed games in a cache (default: ~/.cache/lyir/games.sqlite)"
+        " so an unchanged PGN file is not parsed again",
+    )
+    parser.add_argument(
+        "--export",
+        metavar="FILE",
+        help="Also save the stats and rating series as a summary (.json.gz)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.fetch:
+        username = args.fetch
+    else:
+        pgn_file = args.pgn_file or input("Enter the path to your PGN file: ")
+        username = args.username or input("Enter your Lichess Username: ")
+
+    sketch = None
+    if args.sketch:
+        sketch = {}
+        if args.top_k_error:
+            sketch["top_k_error"] = args.top_k_error
+        if args.length_accuracy:
+            sketch["length_accuracy"] = args.length_accuracy
+
+    if args.fetch:
+        from fetch import fetch_stats
+
+        # Parsed while they download
+        stats = fetch_stats([username], args.state_dir, sketch=sketch)[username]
+    elif args.cache is not None:
+        from game_cache import DEFAULT_CACHE_PATH, GameCache
+
+        with GameCache(args.cache or DEFAULT_CACHE_PATH) as cache:
+            games = cache.games(pgn_file)
+        stats = analyze_games(games, username, sketch)
+    else:
+        # Stream the games straight into the stats, no game is kept in memory
+        stats = analyze_games(iter_games(pgn_file, fast=True), username, sketch)
+
+    if args.export:
+        from export import export_summary
+
+        export_summary(stats, args.export, username)
+
+    if args.format == "json":
+        import json
 
-    games = parse_pgn(pgn_file)
-    stats = analyze_games(games, username)
-    display_stats(stats, games, username)
+        json.dump(stats_to_dict(stats), sys.stdout)
+        print()
+        if args.charts and not args.stats_only:
+            from render import render_charts
+
+            render_charts(stats, args.charts, args.image_format)
+        return
+
+    display_stats(
+        stats,
+        output_dir=args.charts,
+        image_format=args.image_format,
+        game_type_number=game_types.get(args.game_type),
+        charts=not args.stats_only,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import argparse
+import json
+import re
+from array import array
+
+from lyir import ScannedGame, game_outcome, iter_games
+
+# Plies of every game kept in the tree
+DEFAULT_MAX_PLIES = 12
+
+# Per node and user color: games, wins, losses, draws
+TREE_FIELDS = ("games", "wins", "losses", "draws")
+TREE_COLORS = ("White", "Black")
+TREE_OFFSETS = {"White": 0, "Black": len(TREE_FIELDS)}
+NODE_SIZE = len(TREE_COLORS) * len(TREE_FIELDS)
+NODE_ZEROS = [0] * NODE_SIZE
+
+# Move numbers, results and anything that is not a move in a query line
+_NOT_A_MOVE = re.compile(r"^(?:[0-9]+\.+|\.+|\*|1-0|0-1|1/2-1/2)$")
+
+
+def normalize_san(san):
+    # Same key for a move however it was written: check marks and annotations
+    # dropped, castling with letters, numbers glued to the move removed
+    san = re.sub(r"^[0-9]+\.+", "", san).rstrip("+#!?")
+    if san.startswith("0-0"):
+        san = san.replace("0", "O")
+    return san
+
+
+def parse_line(line):
+    """
+    SAN moves of a line given as "1.e4 c5 2.Nf3", "e4 c5 Nf3" or a list.
+    """
+    tokens = line.split() if isinstance(line, str) else line
+    moves = []
+    for token in tokens:
+        if not _NOT_A_MOVE.match(token):
+            moves.append(normalize_san(token))
+    return [move for move in moves if move]
+
+
+def opening_moves(game, max_plies):
+    """
+    SAN of the first max_plies mainline moves of a game, from the scanner
+    when it kept them, by replaying the mainline otherwise. Raises TypeError
+    for games without moves: GameRecord, or ScannedGame scanned without
+    opening_plies.
+    """
+    if isinstance(game, ScannedGame):
+        if game.moves is None:
+            raise TypeError("ScannedGame has no moves, scan with opening_plies")
+        return game.moves[:max_plies]
+    if not hasattr(game, "mainline_moves"):
+        raise TypeError(f"{type(game).__name__} has no moves")
+    moves = []
+    board = game.board()
+    for move in game.mainline_moves():
+        if len(moves) == max_plies:
+            break
+        moves.append(board.san(move))
+        board.push(move)
+    return moves
+
+
+class OpeningTree:
+    """
+    Trie of the first max_plies moves of the user's games, with the user's
+    games, wins, losses and draws by color at every node. A node counts every
+    game that went through it, so the results after a line are read at its
+    last node without walking the subtree. Nodes live in flat arrays and one
+    (parent, move) dict, so memory grows with the number of distinct
+    prefixes, not with the number of games.
+    - max_plies: Number of first plies of each game added
+    """
+
+    def __init__(self, max_plies=DEFAULT_MAX_PLIES):
+        self.max_plies = max_plies
+        self.index = {}  # (parent, san) -> node
+        self.moves = [None]  # san of the move leading to each node
+        self.parents = array("i", [-1])
+        self.first_child = array("i", [-1])
+        self.next_sibling = array("i", [-1])
+        self.counts = array("i", [0] * NODE_SIZE)
+
+    def __len__(self):
+        # Number of nodes, the root included
+        return len(self.moves)
+
+    def __eq__(self, other):
+        if not isinstance(other, OpeningTree):
+            return NotImplemented
+        return self.max_plies == other.max_plies and self.to_dict() == other.to_dict()
+
+    def _child(self, parent, san):
+        node = self.index.get((parent, san))
+        if node is None:
+            node = len(self.moves)
+            self.index[(parent, san)] = node
+            self.moves.append(san)
+            self.parents.append(parent)
+            self.first_child.append(-1)
+            # Newest child first, children() orders them anyway
+            self.next_sibling.append(self.first_child[parent])
+            self.first_child[parent] = node
+            self.counts.extend(NODE_ZEROS)
+        return node
+
+    def add(self, moves, color, outcome=None):
+        """
+        Count one game along its first max_plies moves.
+        - moves: SAN moves from the initial position
+        - color: Color the user played, "White" or "Black"
+        - outcome: "wins", "losses", "draws" or None for undecided games
+        """
+        counts = self.counts
+        offset = TREE_OFFSETS[color]
+        result = TREE_FIELDS.index(outcome) if outcome is not None else None
+        node = 0
+        for depth in range(min(len(moves), self.max_plies) + 1):
+            if depth:
+                node = self._child(node, normalize_san(moves[depth - 1]))
+            base = node * NODE_SIZE + offset
+            counts[base] += 1
+            if result is not None:
+                counts[base + result] += 1
+
+    def add_game(self, game, username):
+        """
+        Add a game played by username, other games are ignored. Games
+        starting from a set-up position are ignored too.
+        """
+        headers = game.headers
+        white, black = headers.get("White"), headers.get("Black")
+        if username not in (white, black) or headers.get("FEN") is not None:
+            return False
+        outcome, color = game_outcome(headers.get("Result"), white, black, username)
+        self.add(opening_moves(game, self.max_plies), color, outcome)
+        return True
+
+    def node(self, line=()):
+        # Node reached by a line of moves, None when no game played it
+        node = 0
+        for san in parse_line(line):
+            node = self.index.get((node, san))
+            if node is None:
+                return None
+        return node
+
+    def _record(self, node, color):
+        counts = self.counts
+        colors = TREE_COLORS if color is None else (color,)
+        record = dict.fromkeys(TREE_FIELDS, 0)
+        for side in colors:
+            base = node * NODE_SIZE + TREE_OFFSETS[side]
+            for index, field in enumerate(TREE_FIELDS):
+                record[field] += counts[base + index]
+        return record
+
+    def results(self, line=(), color=None):
+        """
+        Games, wins, losses and draws of the user after a line, e.g.
+        tree.results("1.e4 c5 2.Nf3", color="White").
+        - line: Moves from the initial position, see parse_line
+        - color: "White" or "Black", None for both
+        """
+        node = self.node(line)
+        if node is None:
+            return dict.fromkeys(TREE_FIELDS, 0)
+        return self._record(node, color)
+
+    def children(self, line=(), color=None):
+        """
+        [(san, record)] of the moves played after a line, most played first,
+        skipping moves the user never reached with that color.
+        """
+        node = self.node(line)
+        if node is None:
+            return []
+        moves = []
+        child = self.first_child[node]
+        while child != -1:
+            record = self._record(child, color)
+            if record["games"]:
+                moves.append((self.moves[child], record))
+            child = self.next_sibling[child]
+        moves.sort(key=lambda item: item[1]["games"], reverse=True)
+        return moves
+
+    def line(self, node):
+        # Moves leading to a node
+        moves = []
+        while node > 0:
+            moves.append(self.moves[node])
+            node = self.parents[node]
+        return moves[::-1]
+
+    def lines(self, color=None, min_games=1, depth=None):
+        """
+        Generator over (moves, record) of every node with at least min_games
+        games, depth first, down to depth plies (default: all).
+        """
+        stack = [(0, 0)]
+        while stack:
+            node, level = stack.pop()
+            record = self._record(node, color)
+            if record["games"] < min_games:
+                continue
+            if node:
+                yield self.line(node), record
+            if depth is None or level < depth:
+                child = self.first_child[node]
+                while child != -1:
+                    stack.append((child, level + 1))
+                    child = self.next_sibling[child]
+
+    def merge(self, other):
+        """
+        Add the games of another tree, e.g. built from another shard.
+        """
+        if other.max_plies != self.max_plies:
+            raise ValueError("Cannot merge opening trees of different depth")
+        # Parents come before their children, so they are mapped first
+        mapping = array("i", [0]) * len(other)
+        counts, theirs = self.counts, other.counts
+        for node in range(len(other)):
+            if node:
+                mapping[node] = self._child(
+                    mapping[other.parents[node]], other.moves[node]
+                )
+            base, their_base = mapping[node] * NODE_SIZE, node * NODE_SIZE
+            for index in range(NODE_SIZE):
+                counts[base + index] += theirs[their_base + index]
+        return self
+
+    def to_dict(self):
+        # Nodes in creation order, each after its parent
+        return {
+            "max_plies": self.max_plies,
+            "parents": self.parents.tolist(),
+            "moves": self.moves,
+            "counts": self.counts.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        tree = cls(data["max_plies"])
+        moves, parents = data["moves"], data["parents"]
+        for node in range(1, len(moves)):
+            tree._child(parents[node], moves[node])
+        tree.counts = array("i", data["counts"])
+        return tree
+
+
+def build_tree(file_path, username, max_plies=DEFAULT_MAX_PLIES):
+    """
+    Opening tree of a user's games from a PGN file, with the moves kept by
+    the scanner so no game is replayed.
+    """
+    tree = OpeningTree(max_plies)
+    for game in iter_games(file_path, fast=True, opening_plies=max_plies):
+        tree.add_game(game, username)
+    return tree
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Opening tree of a player's games")
+    parser.add_argument("pgn_file")
+    parser.add_argument("username")
+    parser.add_argument("line", nargs="*", help="Moves to look at, e.g. 1.e4 c5 2.Nf3")
+    parser.add_argument("--plies", type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument("--color", choices=TREE_COLORS)
+    parser.add_argument("--json", action="store_true", help="Dump the whole tree")
+    args = parser.parse_args()
+
+    tree = build_tree(args.pgn_file, args.username, args.plies)
+    if args.json:
+        print(json.dumps(tree.to_dict()))
+    else:
+        record = tree.results(args.line, args.color)
+        print(" ".join(parse_line(args.line)) or "(start)", record)
+        for san, record in tree.children(args.line, args.color):
+            rate = 100 * record["wins"] / record["games"]
+            print(f"  {san:8} {record['games']:7} games  {rate:5.1f}% wins")
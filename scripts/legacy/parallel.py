@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+
+from lyir import analyze_games, merge_stats, new_stats, scan_games
+
+# Each game starts with its Event tag in Lichess exports
+GAME_START = b"[Event "
+
+# Shards per worker, smaller shards even out the load between processes
+SHARDS_PER_WORKER = 4
+
+
+def find_shards(file_path, count):
+    """
+    Split a PGN file into at most count byte ranges, each starting at a game.
+    - file_path: Path to the PGN file
+    - count: Number of shards wanted
+    Returns a list of (start, end) byte offsets covering the whole file.
+    """
+    size = os.path.getsize(file_path)
+    boundaries = [0]
+
+    with open(file_path, "rb") as file:
+        for shard in range(1, count):
+            target = max(size * shard // count, boundaries[-1])
+            file.seek(target)
+            if target:
+                file.readline()  # Skip the partial line we landed in
+            while True:
+                position = file.tell()
+                line = file.readline()
+                if not line:
+                    break
+                if line.startswith(GAME_START):
+                    if position > boundaries[-1]:
+                        boundaries.append(position)
+                    break
+
+    boundaries.append(size)
+    return [
+        (start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start
+    ]
+
+
+def read_lines(file_path, start, end):
+    # Lines of a byte range, decoded like the text-mode reader in iter_games
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        position = start
+        for line in file:
+            if position >= end:
+                break
+            position += len(line)
+            yield line.decode("utf-8").replace("\r\n", "\n")
+
+
+def analyze_shard(file_path, start, end, username):
+    return analyze_games(scan_games(read_lines(file_path, start, end)), username)
+
+
+def analyze_pgn_parallel(file_path, username, workers=None):
+    """
+    Parse and analyze a PGN file in a process pool, one shard per task, and
+    merge the per-shard stats in file order.
+    - file_path: Path to the PGN file
+    - username: The username of the player whose games are being analyzed
+    - workers: Number of processes (default: one per CPU)
+    """
+    workers = workers or os.cpu_count() or 1
+    shards = find_shards(file_path, workers * SHARDS_PER_WORKER)
+    if not shards:
+        return new_stats()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = pool.map(
+            analyze_shard,
+            [file_path] * len(shards),
+            [start for start, _ in shards],
+            [end for _, end in shards],
+            [username] * len(shards),
+        )
+        return reduce(merge_stats, parts)
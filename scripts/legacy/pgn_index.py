@@ -0,0 +1,266 @@
+import io
+import mmap
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+
+from lyir import (
+    DEFAULT_MAX_GAMES,
+    GAME_TYPE_MAP,
+    categorize_time_control,
+    scan_games,
+)
+
+# Bump when the layout of the sidecar changes, older indexes are rebuilt
+INDEX_VERSION = 1
+
+# Header fields kept in the index
+INDEXED_TAGS = (b"Date", b"TimeControl", b"White", b"Black", b"WhiteElo", b"BlackElo")
+TAG_REGEX = re.compile(rb'^\[([A-Za-z0-9][A-Za-z0-9_+#=:-]*)\s+"([^\r]*)"\]\s*$')
+
+# Category codes follow GAME_TYPE_MAP, -1 marks time controls that do not categorize
+CATEGORY_CODES = {name: number for number, name in GAME_TYPE_MAP.items()}
+
+NO_ELO = -1
+
+
+def index_path(file_path):
+    return file_path + ".idx.npz"
+
+
+def _parse_date(value):
+    # Dates are stored as YYYYMMDD integers, 0 when the Date header does not parse
+    try:
+        date = datetime.strptime(value, "%Y.%m.%d")
+    except ValueError:
+        return 0
+    return date.year * 10000 + date.month * 100 + date.day
+
+
+def _parse_category(value):
+    try:
+        return CATEGORY_CODES[categorize_time_control(value)]
+    except ValueError:
+        return -1
+
+
+def _parse_elo(value):
+    try:
+        return int(value) if value else NO_ELO
+    except ValueError:
+        return NO_ELO
+
+
+def _to_date(value):
+    # datetime, date or "YYYY.MM.DD" to a YYYYMMDD integer
+    if isinstance(value, str):
+        value = datetime.strptime(value, "%Y.%m.%d")
+    return value.year * 10000 + value.month * 100 + value.day
+
+
+class PgnIndex:
+    """
+    Memory-mapped PGN file with a per-game offset index.
+    The index holds, per game, its byte offset and length plus the date,
+    time control category, player ids and Elo ratings, and is saved next to
+    the PGN file so later opens skip the scan.
+    - file_path: Path to the PGN file
+    """
+
+    def __init__(self, file_path, arrays):
+        self.file_path = file_path
+        self.offset = arrays["offset"]
+        self.length = arrays["length"]
+        self.date = arrays["date"]
+        self.category = arrays["category"]
+        self.white = arrays["white"]
+        self.black = arrays["black"]
+        self.white_elo = arrays["white_elo"]
+        self.black_elo = arrays["black_elo"]
+        self.players = arrays["players"]
+        self._player_ids = None
+
+        self._file = open(file_path, "rb")
+        if os.fstat(self._file.fileno()).st_size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._map = b""
+
+    def __len__(self):
+        return len(self.offset)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    @classmethod
+    def open(cls, file_path, rebuild=False):
+        """
+        Load the sidecar index of a PGN file, or build and save it when it is
+        missing or the file changed since it was written.
+        """
+        stat = os.stat(file_path)
+        sidecar = index_path(file_path)
+        if not rebuild and os.path.exists(sidecar):
+            with np.load(sidecar) as saved:
+                meta = saved["meta"].tolist()
+                if meta == [INDEX_VERSION, stat.st_size, stat.st_mtime_ns]:
+                    return cls(file_path, {key: saved[key] for key in saved.files})
+
+        arrays = build_index(file_path)
+        arrays["meta"] = np.array(
+            [INDEX_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64
+        )
+        temporary = sidecar[: -len(".npz")] + ".tmp.npz"
+        np.savez(temporary, **arrays)
+        os.replace(temporary, sidecar)
+        return cls(file_path, arrays)
+
+    def game_text(self, row):
+        start = int(self.offset[row])
+        return self._map[start : start + int(self.length[row])].decode("utf-8")
+
+    def game(self, row):
+        return next(scan_games(io.StringIO(self.game_text(row))))
+
+    def games(self, rows=None):
+        """
+        Generator over the games at the given rows (default: all), decoding
+        only those games.
+        """
+        if rows is None:
+            rows = range(len(self))
+        for row in rows:
+            yield self.game(row)
+
+    def date_range(self, start=None, end=None):
+        """
+        Rows of the games played between start and end, both inclusive.
+        Bounds are datetime/date objects or "YYYY.MM.DD" strings.
+        """
+        mask = self.date > 0
+        if start is not None:
+            mask &= self.date >= _to_date(start)
+        if end is not None:
+            mask &= self.date <= _to_date(end)
+        return np.flatnonzero(mask)
+
+    def player_id(self, username):
+        if self._player_ids is None:
+            self._player_ids = {
+                name: number for number, name in enumerate(self.players.tolist())
+            }
+        return self._player_ids.get(username, -1)
+
+    def player_rows(self, username):
+        player = self.player_id(username)
+        return np.flatnonzero((self.white == player) | (self.black == player))
+
+    def rating_progression(self, username, game_type_number, max_games=DEFAULT_MAX_GAMES):
+        """
+        get_rating_progression answered from the index, without decoding games.
+        """
+        game_type = GAME_TYPE_MAP.get(game_type_number, "Blitz")
+        player = self.player_id(username)
+        elo = np.where(self.white == player, self.white_elo, self.black_elo)
+        mask = (
+            (self.category == CATEGORY_CODES[game_type])
+            & ((self.white == player) | (self.black == player))
+            & (elo != NO_ELO)
+            & (self.date > 0)
+        )
+        rows = np.flatnonzero(mask)[:max_games]
+        dates = [
+            datetime(date // 10000, date // 100 % 100, date % 100)
+            for date in self.date[rows].tolist()
+        ]
+        return dates, elo[rows].tolist()
+
+
+def build_index(file_path):
+    """
+    Scan a PGN file once and return the index arrays. A game starts at the
+    first tag pair line after movetext or an empty line, as in Lichess exports.
+    """
+    offsets = []
+    dates = []
+    categories = []
+    whites = []
+    blacks = []
+    white_elos = []
+    black_elos = []
+    player_ids = {}
+    date_cache = {}
+    category_cache = {}
+
+    with open(file_path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            data = b""
+        else:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            position = 0
+            in_headers = False
+            tags = {}
+
+            def finish():
+                date = tags.get(b"Date", b"????.??.??").decode("utf-8")
+                if date not in date_cache:
+                    date_cache[date] = _parse_date(date)
+                dates.append(date_cache[date])
+                time_control = tags.get(b"TimeControl", b"Unknown").decode("utf-8")
+                if time_control not in category_cache:
+                    category_cache[time_control] = _parse_category(time_control)
+                categories.append(category_cache[time_control])
+                for tag, column in ((b"White", whites), (b"Black", blacks)):
+                    name = tags.get(tag, b"?").decode("utf-8")
+                    column.append(player_ids.setdefault(name, len(player_ids)))
+                white_elos.append(_parse_elo(tags.get(b"WhiteElo")))
+                black_elos.append(_parse_elo(tags.get(b"BlackElo")))
+
+            while position < size:
+                end = data.find(b"\n", position)
+                end = size if end == -1 else end + 1
+                if data[position : position + 1] == b"[":
+                    if not in_headers:
+                        if offsets:
+                            finish()
+                        offsets.append(position)
+                        tags = {}
+                        in_headers = True
+                    match = TAG_REGEX.match(data[position:end])
+                    if match and match.group(1) in INDEXED_TAGS:
+                        tags[match.group(1)] = match.group(2)
+                else:
+                    in_headers = False
+                position = end
+
+            if offsets:
+                finish()
+        finally:
+            if size:
+                data.close()
+
+    offset = np.array(offsets, dtype=np.int64)
+    return {
+        "offset": offset,
+        "length": np.diff(np.append(offset, size)),
+        "date": np.array(dates, dtype=np.int32),
+        "category": np.array(categories, dtype=np.int8),
+        "white": np.array(whites, dtype=np.int32),
+        "black": np.array(blacks, dtype=np.int32),
+        "white_elo": np.array(white_elos, dtype=np.int32),
+        "black_elo": np.array(black_elos, dtype=np.int32),
+        "players": np.array(list(player_ids), dtype=np.str_),
+    }
@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+matplotlib.use("Agg")  # Headless, charts only go to files
+
+from matplotlib.figure import Figure
+
+from lyir import (
+    GAME_TYPE_MAP,
+    analyze_games,
+    draw_monthly_performance,
+    draw_rating_progression,
+    iter_games,
+    stats_from_dict,
+)
+
+# Size of every chart, in inches, like the interactive plots
+FIGURE_SIZE = (10, 6)
+
+# Figure reused by every chart rendered in this process
+_figure = None
+
+
+def _safe_name(username):
+    # Usernames become directory names
+    return re.sub(r"[^\w.-]", "_", username)
+
+
+def chart_tasks(stats, directory, image_format="png"):
+    """
+    (kind, data, path) for the monthly performance chart and the rating
+    progression of every game type of one analysis.
+    """
+    tasks = [
+        (
+            "monthly",
+            dict(stats["monthly_performance"]),
+            os.path.join(directory, f"monthly_performance.{image_format}"),
+        )
+    ]
+    for game_type in GAME_TYPE_MAP.values():
+        dates, ratings = stats["ratings"].series(game_type)
+        tasks.append(
+            (
+                "rating",
+                (dates, ratings, game_type),
+                os.path.join(directory, f"rating_{game_type.lower()}.{image_format}"),
+            )
+        )
+    return tasks
+
+
+def render_task(task):
+    """
+    Render one chart task to its file on the figure of this process.
+    Returns the path, or None when there was nothing to draw.
+    """
+    global _figure
+    kind, data, path = task
+    if _figure is None:
+        _figure = Figure(figsize=FIGURE_SIZE)
+    else:
+        _figure.clf()
+
+    if kind == "monthly":
+        draw_monthly_performance(_figure, data)
+    elif not draw_rating_progression(_figure, *data):
+        return None
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    _figure.savefig(path, format=os.path.splitext(path)[1][1:])
+    return path
+
+
+def render_tasks(tasks, workers=None):
+    """
+    Render chart tasks, in a process pool when workers is more than one.
+    Returns the paths written.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        paths = map(render_task, tasks)
+        return [path for path in paths if path is not None]
+
+    # Several charts per task batch, so each worker reuses its figure
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        paths = pool.map(render_task, tasks, chunksize=chunksize)
+        return [path for path in paths if path is not None]
+
+
+def render_charts(stats, output_dir, image_format="png", workers=None):
+    """
+    Save the monthly performance and the four rating progression charts of
+    one analysis to output_dir. Game types without rated games are skipped.
+    - workers: Rendering processes, one per core by default
+    """
+    return render_tasks(chart_tasks(stats, output_dir, image_format), workers)
+
+
+def render_users(results, output_dir, image_format="png", workers=None):
+    """
+    Save the charts of many players, one directory per player, rendering
+    across players and charts in a process pool.
+    - results: Iterable of (username, stats), as from BatchAnalyzer.results
+    """
+    tasks = []
+    for username, stats in results:
+        directory = os.path.join(output_dir, _safe_name(username))
+        tasks.extend(chart_tasks(stats, directory, image_format))
+    return render_tasks(tasks, workers)
+
+
+def _batch_results(path):
+    # Players written by batch.analyze_batch
+    with open(path, "r") as file:
+        for line in file:
+            entry = json.loads(line)
+            yield entry["username"], stats_from_dict(entry["stats"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render lyir charts to image files")
+    parser.add_argument("pgn_file", nargs="?")
+    parser.add_argument("usernames", nargs="*")
+    parser.add_argument("--batch", help="Render every player of an analyze_batch output")
+    parser.add_argument("--output-dir", default="charts")
+    parser.add_argument("--format", choices=("png", "svg"), default="png")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    if args.batch:
+        results = _batch_results(args.batch)
+    elif args.pgn_file and len(args.usernames) == 1:
+        username = args.usernames[0]
+        results = [(username, analyze_games(iter_games(args.pgn_file, fast=True), username))]
+    elif args.pgn_file and args.usernames:
+        from batch import BatchAnalyzer
+
+        # One pass over the file for all players, each with their own games
+        analyzer = BatchAnalyzer(args.usernames)
+        for game in iter_games(args.pgn_file, fast=True):
+            analyzer.add_game(game)
+        results = analyzer.results()
+    else:
+        parser.error("give a PGN file and usernames, or --batch")
+
+    for path in render_users(results, args.output_dir, args.format, args.workers):
+        print(path)
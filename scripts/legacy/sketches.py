@@ -0,0 +1,304 @@
+import heapq
+import math
+
+from lyir import new_record
+
+# Count error of the top-k tables as a fraction of the games seen, the
+# capacity of a table is 1 / DEFAULT_TOP_K_ERROR keys
+DEFAULT_TOP_K_ERROR = 0.001
+
+# Relative error of the game length quantiles
+DEFAULT_LENGTH_ACCURACY = 0.01
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters (Metwally et al.) with a win/loss/draw record
+    per key, in place of a Counter or a defaultdict of records. At most
+    capacity keys are kept. Any key seen more than n / capacity times out of
+    n is kept, its count is overestimated by at most error(key) <= n /
+    capacity and its record misses at most that many games. While no key
+    has been evicted everything is exact, in first-seen order like a dict.
+    - capacity: Number of keys kept
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = {}  # key -> [count, error, record]
+        self._heap = []  # (count, sequence, key), counts may lag behind
+        self._sequence = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __getitem__(self, key):
+        # Record of a key, an empty one for keys that are not kept
+        entry = self.entries.get(key)
+        return entry[2] if entry is not None else new_record()
+
+    def __eq__(self, other):
+        if not isinstance(other, SpaceSaving):
+            return NotImplemented
+        return self.capacity == other.capacity and list(self.entries.items()) == list(
+            other.entries.items()
+        )
+
+    def add(self, key, outcome=None):
+        """
+        Count one game of key, and its outcome ("wins", "losses", "draws" or
+        None) in the record.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            if len(self.entries) < self.capacity:
+                count = 0
+            else:
+                # Take over the slot of the smallest count, inheriting it as error
+                evicted, count = self._pop_min()
+                del self.entries[evicted]
+            entry = self.entries[key] = [count, count, new_record()]
+            heapq.heappush(self._heap, (count, self._sequence, key))
+            self._sequence += 1
+        entry[0] += 1
+        if outcome is not None:
+            entry[2][outcome] += 1
+
+    def _pop_min(self):
+        heap = self._heap
+        while True:
+            count, sequence, key = heap[0]
+            actual = self.entries[key][0]
+            if count == actual:
+                heapq.heappop(heap)
+                return key, count
+            heapq.heapreplace(heap, (actual, sequence, key))
+
+    def _rebuild_heap(self):
+        self._heap = [
+            (entry[0], sequence, key)
+            for sequence, (key, entry) in enumerate(self.entries.items())
+        ]
+        heapq.heapify(self._heap)
+        self._sequence = len(self._heap)
+
+    def count(self, key):
+        entry = self.entries.get(key)
+        return entry[0] if entry is not None else 0
+
+    def error(self, key):
+        entry = self.entries.get(key)
+        return entry[1] if entry is not None else 0
+
+    def most_common(self, n=None):
+        # Like Counter.most_common, ties in first-seen order
+        ranked = sorted(
+            ((key, entry[0]) for key, entry in self.entries.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        return ranked if n is None else ranked[:n]
+
+    def items(self):
+        # (key, record) pairs, like a defaultdict of records
+        return ((key, entry[2]) for key, entry in self.entries.items())
+
+    def _floor(self):
+        # Smallest count once full, what an unkept key may have had
+        if len(self.entries) < self.capacity:
+            return 0
+        return min(entry[0] for entry in self.entries.values())
+
+    def merge(self, other):
+        """
+        Merge the sketch of a later run of games into this one, keeping the
+        capacity largest counts (the mergeable Space-Saving of Agarwal et al.).
+        """
+        floor, other_floor = self._floor(), other._floor()
+        merged = {}
+        for key, (count, error, record) in self.entries.items():
+            theirs = other.entries.get(key)
+            if theirs is None:
+                merged[key] = [count + other_floor, error + other_floor, record]
+            else:
+                record = {
+                    outcome: count + theirs[2][outcome]
+                    for outcome, count in record.items()
+                }
+                merged[key] = [count + theirs[0], error + theirs[1], record]
+        for key, (count, error, record) in other.entries.items():
+            if key not in merged:
+                merged[key] = [count + floor, error + floor, dict(record)]
+
+        if len(merged) > self.capacity:
+            kept = sorted(merged, key=lambda key: merged[key][0], reverse=True)
+            kept = set(kept[: self.capacity])
+            merged = {key: entry for key, entry in merged.items() if key in kept}
+        self.entries = merged
+        self._rebuild_heap()
+        return self
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "entries": [
+                [key, count, error, dict(record)]
+                for key, (count, error, record) in self.entries.items()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["capacity"])
+        sketch.entries = {
+            key: [count, error, record] for key, count, error, record in data["entries"]
+        }
+        sketch._rebuild_heap()
+        return sketch
+
+
+class LengthSketch:
+    """
+    Game lengths by result in constant memory, the exact aggregates of
+    new_lengths plus quantiles. Every game counts towards the overall average.
+    Per result, games of more than one ply (the ones display_stats reports)
+    keep an exact count, sum, min and max plus a log-bucketed histogram
+    (DDSketch) whose quantiles are within relative_accuracy of the truth.
+    - relative_accuracy: Relative error of the quantiles
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_LENGTH_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.games = 0
+        self.total = 0
+        self.results = {}  # result -> [count, sum, min, max, {bucket: count}]
+
+    def __eq__(self, other):
+        if not isinstance(other, LengthSketch):
+            return NotImplemented
+        return (
+            self.relative_accuracy == other.relative_accuracy
+            and self.games == other.games
+            and self.total == other.total
+            and self.results == other.results
+        )
+
+    def add(self, length, result):
+        self.games += 1
+        self.total += length
+        if length <= 1:
+            return
+        summary = self.results.get(result)
+        if summary is None:
+            summary = self.results[result] = [0, 0, length, length, {}]
+        summary[0] += 1
+        summary[1] += length
+        summary[2] = min(summary[2], length)
+        summary[3] = max(summary[3], length)
+        bucket = math.ceil(math.log(length) / self._log_gamma)
+        summary[4][bucket] = summary[4].get(bucket, 0) + 1
+
+    def mean(self, result=None):
+        # Average over every game, or over the games of a result longer than one ply
+        if result is None:
+            return self.total / self.games if self.games else 0
+        summary = self.results.get(result)
+        return summary[1] / summary[0] if summary else 0
+
+    def minimum(self, result):
+        summary = self.results.get(result)
+        return summary[2] if summary else None
+
+    def maximum(self, result):
+        summary = self.results.get(result)
+        return summary[3] if summary else None
+
+    def quantile(self, result, q):
+        """
+        Approximate q-quantile (0 to 1) of the lengths of a result, None when
+        there are no games.
+        """
+        summary = self.results.get(result)
+        if not summary:
+            return None
+        rank = q * (summary[0] - 1)
+        seen = 0
+        for bucket in sorted(summary[4]):
+            seen += summary[4][bucket]
+            if seen > rank:
+                estimate = 2 * self.gamma**bucket / (self.gamma + 1)
+                return min(max(estimate, summary[2]), summary[3])
+        return summary[3]
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge length sketches of different accuracy")
+        self.games += other.games
+        self.total += other.total
+        for result, theirs in other.results.items():
+            summary = self.results.get(result)
+            if summary is None:
+                self.results[result] = theirs[:4] + [dict(theirs[4])]
+                continue
+            summary[0] += theirs[0]
+            summary[1] += theirs[1]
+            summary[2] = min(summary[2], theirs[2])
+            summary[3] = max(summary[3], theirs[3])
+            for bucket, count in theirs[4].items():
+                summary[4][bucket] = summary[4].get(bucket, 0) + count
+        return self
+
+    def to_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "games": self.games,
+            "total": self.total,
+            "results": {
+                result: summary[:4]
+                + [{str(bucket): count for bucket, count in summary[4].items()}]
+                for result, summary in self.results.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["relative_accuracy"])
+        sketch.games = data["games"]
+        sketch.total = data["total"]
+        sketch.results = {
+            result: summary[:4]
+            + [{int(bucket): count for bucket, count in summary[4].items()}]
+            for result, summary in data["results"].items()
+        }
+        return sketch
+
+
+# Stats entries replaced by sketches in sketch mode
+SKETCH_KEYS = ("openings", "opening_success", "head_to_head", "game_lengths")
+
+
+def sketch_tables(
+    top_k_error=DEFAULT_TOP_K_ERROR, length_accuracy=DEFAULT_LENGTH_ACCURACY
+):
+    """
+    The sketches of SKETCH_KEYS for new_stats in sketch mode.
+    - top_k_error: Count error of openings and opponents, as a fraction of games
+    - length_accuracy: Relative error of game length quantiles
+    """
+    capacity = math.ceil(1 / top_k_error)
+    # One table is both the opening counts and their records, so an opening
+    # never has one without the other
+    openings = SpaceSaving(capacity)
+    return {
+        "openings": openings,
+        "opening_success": openings,
+        "head_to_head": SpaceSaving(capacity),
+        "game_lengths": LengthSketch(length_accuracy),
+    }
@@ -0,0 +1,67 @@
+# Minimal UCI engine for testing engine_analysis without Stockfish: scores a
+# position by material and mobility and plays its first legal move.
+#   python engine_analysis.py export.pgn username --engine "python stub_engine.py"
+import sys
+
+import chess
+
+PIECE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 300,
+    chess.BISHOP: 320,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 0,
+}
+
+
+def evaluate(board):
+    # Centipawns from the side to move
+    score = 0
+    for piece_type, value in PIECE_VALUES.items():
+        score += value * len(board.pieces(piece_type, board.turn))
+        score -= value * len(board.pieces(piece_type, not board.turn))
+    return score + board.legal_moves.count()
+
+
+def position(board, arguments):
+    # "position startpos|fen <fen> [moves <uci>...]"
+    tokens = arguments.split()
+    if tokens and tokens[0] == "startpos":
+        board.reset()
+        tokens = tokens[1:]
+    elif tokens and tokens[0] == "fen":
+        end = tokens.index("moves") if "moves" in tokens else len(tokens)
+        board.set_fen(" ".join(tokens[1:end]))
+        tokens = tokens[end:]
+    if tokens and tokens[0] == "moves":
+        for move in tokens[1:]:
+            board.push_uci(move)
+
+
+def main():
+    board = chess.Board()
+    for line in sys.stdin:
+        command, _, arguments = line.strip().partition(" ")
+        if command == "uci":
+            print("id name stub")
+            print("id author lyir")
+            print("uciok")
+        elif command == "isready":
+            print("readyok")
+        elif command == "ucinewgame":
+            board.reset()
+        elif command == "position":
+            position(board, arguments)
+        elif command == "go":
+            move = next(iter(board.legal_moves), None)
+            pv = f" pv {move.uci()}" if move else ""
+            print(f"info depth 1 seldepth 1 nodes 1 score cp {evaluate(board)}{pv}")
+            print(f"bestmove {move.uci() if move else '0000'}")
+        elif command == "quit":
+            break
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
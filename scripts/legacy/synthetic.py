@@ -0,0 +1,200 @@
+import argparse
+import random
+from datetime import datetime, timedelta
+
+DEFAULT_USERNAME = "synthetic_user"
+
+# Distinct move sequences, reused with different headers and clocks
+MOVETEXT_POOL_SIZE = 256
+
+# (TimeControl, weight), weighted like a typical Lichess account
+TIME_CONTROLS = [
+    ("60+0", 10),
+    ("120+1", 5),
+    ("180+0", 20),
+    ("180+2", 20),
+    ("300+0", 15),
+    ("300+3", 10),
+    ("600+0", 8),
+    ("600+5", 6),
+    ("900+10", 4),
+    ("1800+0", 1),
+    ("1800+20", 1),
+]
+
+OPENINGS = [
+    ("B20", "Sicilian Defense"),
+    ("B22", "Sicilian Defense: Alapin Variation"),
+    ("C00", "French Defense"),
+    ("C50", "Italian Game"),
+    ("C60", "Ruy Lopez"),
+    ("D00", "Queen's Pawn Game"),
+    ("D06", "Queen's Gambit"),
+    ("B10", "Caro-Kann Defense"),
+    ("A00", "Van't Kruijs Opening"),
+    ("C41", "Philidor Defense"),
+    ("B01", "Scandinavian Defense"),
+    ("A40", "Englund Gambit"),
+    ("E60", "King's Indian Defense"),
+    ("A45", "Indian Defense"),
+    ("C44", "Scotch Game"),
+]
+
+# Characters of the game ids in the Site header
+GAME_ID_ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+
+def _event(base_time):
+    if base_time < 180:
+        return "Rated Bullet game"
+    if base_time <= 480:
+        return "Rated Blitz game"
+    if base_time <= 1500:
+        return "Rated Rapid game"
+    return "Rated Classical game"
+
+
+def _clock(seconds):
+    seconds = max(0, int(seconds))
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def build_movetext_pool(rng, size=MOVETEXT_POOL_SIZE):
+    """
+    Random legal games as SAN move lists, played out with python-chess.
+    """
+    import chess
+
+    pool = []
+    for _ in range(size):
+        board = chess.Board()
+        moves = []
+        for _ in range(rng.randint(2, 160)):
+            legal_moves = list(board.legal_moves)
+            if not legal_moves:
+                break
+            move = rng.choice(legal_moves)
+            moves.append(board.san(move))
+            board.push(move)
+        pool.append(moves)
+    return pool
+
+
+def render_movetext(moves, time_control, rng):
+    # Lichess layout: clock comment after every move, "N..." after Black's comment
+    base_time, increment = map(int, time_control.split("+"))
+    clocks = [base_time, base_time]
+    parts = []
+    for ply, san in enumerate(moves):
+        side = ply % 2
+        clocks[side] = clocks[side] - rng.uniform(0, base_time / 40) + increment
+        number = ply // 2 + 1
+        prefix = f"{number}. " if side == 0 else f"{number}... "
+        parts.append(f"{prefix}{san} {{ [%clk {_clock(clocks[side])}] }}")
+    return " ".join(parts)
+
+
+def generate_games(count, seed=0, username=DEFAULT_USERNAME, opponents=5000):
+    """
+    Generator over count Lichess-style PGN games (as strings) for username,
+    deterministic for a given seed.
+    - count: Number of games
+    - seed: Random seed
+    - username: The player all games belong to
+    - opponents: Size of the opponent pool, drawn with a long-tail distribution
+    """
+    rng = random.Random(seed)
+    pool = build_movetext_pool(rng)
+    time_controls = [time_control for time_control, _ in TIME_CONTROLS]
+    weights = [weight for _, weight in TIME_CONTROLS]
+    rendered = {
+        time_control: [render_movetext(moves, time_control, rng) for moves in pool]
+        for time_control in time_controls
+    }
+    opponent_names = [f"opponent_{number:05d}" for number in range(opponents)]
+    ratings = {}
+    start = datetime(2023, 1, 1)
+    span = timedelta(days=730).total_seconds()
+
+    for number in range(count):
+        time_control = rng.choices(time_controls, weights)[0]
+        base_time = int(time_control.split("+")[0])
+        event = _event(base_time)
+        rating = ratings.get(event, 1500)
+
+        played = start + timedelta(seconds=span * number / max(count, 1))
+        opponent = opponent_names[min(int(rng.paretovariate(1.2)) - 1, opponents - 1)]
+        opponent_rating = max(600, int(rng.gauss(rating, 150)))
+        user_is_white = rng.random() < 0.5
+        roll = rng.random()
+        if roll < 0.02:
+            outcome = None  # Aborted
+        elif roll < 0.49:
+            outcome = 1
+        elif roll < 0.94:
+            outcome = 0
+        else:
+            outcome = 0.5
+
+        if outcome is None:
+            diff = 0
+            result = "*"
+        else:
+            expected = 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+            diff = round(20 * (outcome - expected))
+            ratings[event] = rating + diff
+            if outcome == 0.5:
+                result = "1/2-1/2"
+            elif (outcome == 1) == user_is_white:
+                result = "1-0"
+            else:
+                result = "0-1"
+
+        white, black = (username, opponent) if user_is_white else (opponent, username)
+        white_elo, black_elo = (
+            (rating, opponent_rating) if user_is_white else (opponent_rating, rating)
+        )
+        white_diff, black_diff = (diff, -diff) if user_is_white else (-diff, diff)
+        eco, opening = rng.choice(OPENINGS)
+        moves = rng.choice(rendered[time_control]) if outcome is not None else ""
+        date = played.strftime("%Y.%m.%d")
+        site = "".join(rng.choices(GAME_ID_ALPHABET, k=8))
+
+        headers = [
+            ("Event", event),
+            ("Site", f"https://lichess.org/{site}"),
+            ("Date", date),
+            ("White", white),
+            ("Black", black),
+            ("Result", result),
+            ("UTCDate", date),
+            ("UTCTime", played.strftime("%H:%M:%S")),
+            ("WhiteElo", str(white_elo)),
+            ("BlackElo", str(black_elo)),
+            ("WhiteRatingDiff", f"{white_diff:+d}"),
+            ("BlackRatingDiff", f"{black_diff:+d}"),
+            ("Variant", "Standard"),
+            ("TimeControl", time_control),
+            ("ECO", eco),
+            ("Opening", opening),
+            ("Termination", "Normal" if outcome is not None else "Abandoned"),
+        ]
+        tags = "\n".join(f'[{tag} "{value}"]' for tag, value in headers)
+        movetext = f"{moves} {result}" if moves else result
+        yield f"{tags}\n\n{movetext}\n\n"
+
+
+def write_pgn(file_path, count, seed=0, username=DEFAULT_USERNAME):
+    with open(file_path, "w") as file:
+        for game in generate_games(count, seed, username):
+            file.write(game)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Lichess PGN export")
+    parser.add_argument("output", help="PGN file to write")
+    parser.add_argument("-n", "--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--username", default=DEFAULT_USERNAME)
+    args = parser.parse_args()
+    write_pgn(args.output, args.games, args.seed, args.username)
@@ -0,0 +1,69 @@
+import os
+import sys
+
+import chess.engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from engine_analysis import run
+
+STUB = [sys.executable, os.path.join(ROOT, "stub_engine.py")]
+LIMIT = chess.engine.Limit(depth=1)
+
+HEADERS = """[Event "Rated Blitz game"]
+[Date "2024.03.01"]
+[White "me"]
+[Black "them"]
+[Result "*"]
+"""
+
+
+def write_pgn(path, *movetexts):
+    with open(path, "w") as file:
+        for movetext in movetexts:
+            file.write(HEADERS + "\n" + movetext + " *\n\n")
+    return str(path)
+
+
+def analyze(pgn, cache, workers=1):
+    return run(pgn, "me", STUB, LIMIT, workers, str(cache))
+
+
+def test_second_run_is_served_from_the_cache(tmp_path):
+    pgn = write_pgn(tmp_path / "games.pgn", "1. e4 e5 2. Nf3 Nc6", "1. d4 d5")
+    cache = tmp_path / "evaluations.sqlite"
+
+    first = analyze(pgn, cache)
+    # 5 + 3 positions, the starting one shared
+    assert first["evaluated"] == 7
+    assert first["cache_hits"] == 0
+
+    second = analyze(pgn, cache)
+    assert second["evaluated"] == 0
+    assert second["cache_hits"] == 7
+    assert second["accuracy"] == first["accuracy"]
+
+
+def test_transposition_is_a_cache_hit(tmp_path):
+    cache = tmp_path / "evaluations.sqlite"
+    analyze(write_pgn(tmp_path / "a.pgn", "1. Nf3 Nf6 2. Nc3 Nc6"), cache)
+
+    # Same start and final position, reached through other moves
+    transposed = write_pgn(tmp_path / "b.pgn", "1. Nc3 Nc6 2. Nf3 Nf6")
+    summary = analyze(transposed, cache)
+    assert summary["cache_hits"] == 2
+    assert summary["evaluated"] == 3
+
+    fresh = analyze(transposed, tmp_path / "fresh.sqlite")
+    assert fresh["evaluated"] == 5
+    assert fresh["accuracy"] == summary["accuracy"]
+
+
+def test_engine_pool_workers_agree(tmp_path):
+    pgn = write_pgn(
+        tmp_path / "games.pgn", "1. e4 c5 2. Nf3 d6 3. d4 cxd4", "1. c4 e5 2. Nc3"
+    )
+    one = analyze(pgn, tmp_path / "one.sqlite", workers=1)
+    two = analyze(pgn, tmp_path / "two.sqlite", workers=2)
+    assert one == two
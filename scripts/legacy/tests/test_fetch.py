@@ -0,0 +1,125 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_lichess import serve
+from fetch import STATE_VERSION, fetch_stats, state_path
+from lyir import analyze_games, iter_games, stats_to_dict
+
+MOVETEXTS = ("1. e4 e5 2. Nf3 Nc6", "1. d4 d5 2. c4", "1. c4 e5", "1. Nf3 d5 2. g3")
+RESULTS = ("1-0", "0-1", "1/2-1/2", "0-1", "1-0", "1-0", "0-1")
+
+
+def game(number, second):
+    # Three games of "me" start in every second, told apart by Site only
+    white, black = ("me", "them") if number % 2 else ("them", "me")
+    result = RESULTS[number % len(RESULTS)]
+    return f"""[Event "Rated Blitz game"]
+[Site "https://lichess.org/game{number:04d}"]
+[Date "2024.03.01"]
+[UTCDate "2024.03.01"]
+[UTCTime "12:00:{second:02d}"]
+[White "{white}"]
+[Black "{black}"]
+[Result "{result}"]
+[TimeControl "180+2"]
+[WhiteElo "{1500 + number}"]
+[BlackElo "1500"]
+
+{MOVETEXTS[number % len(MOVETEXTS)]} {result}
+"""
+
+
+@pytest.fixture
+def pgn(tmp_path):
+    path = tmp_path / "games.pgn"
+    path.write_text("\n".join(game(number, number // 3) for number in range(30)))
+    return str(path)
+
+
+@pytest.fixture
+def expected(pgn):
+    return stats_to_dict(analyze_games(iter_games(pgn, fast=True), "me"))
+
+
+@pytest.fixture
+def server(pgn):
+    server = serve(pgn)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def fetched(pgn, throttle=0, drop_after=None, **options):
+    server = serve(pgn, throttle=throttle, drop_after=drop_after)
+    try:
+        return fetch_stats(["me"], base_url=server.url, backoff=0.01, **options)["me"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.parametrize("fmt", ["pgn", "ndjson"])
+def test_fetch(pgn, expected, fmt):
+    assert stats_to_dict(fetched(pgn, fmt=fmt)) == expected
+
+
+@pytest.mark.parametrize("fmt", ["pgn", "ndjson"])
+@pytest.mark.parametrize("drop_after", [1, 2, 4])
+def test_dropped_connection_resumes_in_the_same_second(pgn, expected, fmt, drop_after):
+    stats = fetched(pgn, fmt=fmt, drop_after=drop_after)
+    assert stats_to_dict(stats) == expected
+
+
+def test_rate_limit_is_retried(pgn, expected):
+    assert stats_to_dict(fetched(pgn, throttle=2)) == expected
+
+
+@pytest.mark.parametrize("fmt", ["pgn", "ndjson"])
+def test_state_resumes_from_last_game_time(server, expected, tmp_path, fmt):
+    state_dir = str(tmp_path / "state")
+
+    def fetched_since(**options):
+        options.update(base_url=server.url, fmt=fmt)
+        return fetch_stats(["me"], state_dir, **options)["me"]
+
+    # Every run stops after 4 games, in the middle of a second, the first ones
+    # of that second sent again by the next run
+    games = None
+    for _ in range(30):
+        stats = fetched_since(params={"max": 4})
+        if sum(stats["game_types"].values()) == games:
+            break
+        games = sum(stats["game_types"].values())
+    assert stats_to_dict(stats) == expected
+
+    with open(state_path(state_dir, "me")) as file:
+        state = json.load(file)
+    assert state["version"] == STATE_VERSION
+    # The games of the last second
+    assert state["seen"] == [
+        f"https://lichess.org/game{number:04d}" for number in (27, 28, 29)
+    ]
+
+    # Nothing new
+    stats = fetched_since()
+    assert stats_to_dict(stats) == expected
+
+
+def test_state_of_another_version_is_ignored(server, expected, tmp_path):
+    state_dir = str(tmp_path / "state")
+    fetch_stats(["me"], state_dir, base_url=server.url)
+    path = state_path(state_dir, "me")
+    with open(path) as file:
+        state = json.load(file)
+    state["version"] = STATE_VERSION - 1
+    with open(path, "w") as file:
+        json.dump(state, file)
+
+    # Starts over instead of adding the games to the old stats again
+    stats = fetch_stats(["me"], state_dir, base_url=server.url)["me"]
+    assert stats_to_dict(stats) == expected
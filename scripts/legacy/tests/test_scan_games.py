@@ -0,0 +1,75 @@
+import io
+import os
+import sys
+
+import chess.pgn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lyir import ScannedGame, analyze_games, scan_games, stats_to_dict
+
+HEADERS = """[Event "Rated Blitz game"]
+[Date "2024.03.01"]
+[White "me"]
+[Black "them"]
+[TimeControl "180+2"]
+[WhiteElo "1500"]
+[BlackElo "1500"]
+"""
+
+
+def read_games(text):
+    games = []
+    handle = io.StringIO(text)
+    while True:
+        game = chess.pgn.read_game(handle)
+        if game is None:
+            return games
+        games.append(game)
+
+
+def assert_same(text):
+    full = read_games(text)
+    fast = list(scan_games(io.StringIO(text)))
+    assert [dict(game.headers) for game in fast] == [
+        dict(game.headers) for game in full
+    ]
+    assert stats_to_dict(analyze_games(fast, "me")) == stats_to_dict(
+        analyze_games(full, "me")
+    )
+    return fast
+
+
+def test_result_from_movetext_when_tag_is_unknown():
+    fast = assert_same(HEADERS + '[Result "*"]\n\n1. e4 e5 2. Qh5 Nc6 1-0\n')
+    assert isinstance(fast[0], ScannedGame)
+    assert fast[0].headers["Result"] == "1-0"
+
+
+def test_result_from_movetext_when_tag_is_missing():
+    fast = assert_same(HEADERS + "\n1. e4 e5 0-1\n")
+    assert fast[0].headers["Result"] == "0-1"
+
+
+def test_result_tag_wins_over_movetext():
+    fast = assert_same(HEADERS + '[Result "1/2-1/2"]\n\n1. e4 e5 1-0\n')
+    assert fast[0].headers["Result"] == "1/2-1/2"
+
+
+def test_first_decisive_movetext_result():
+    assert_same(HEADERS + '[Result "*"]\n\n1. e4 e5 * 1-0 { late } 0-1\n')
+
+
+def test_result_in_variation():
+    assert_same(HEADERS + '[Result "*"]\n\n1. e4 ( 1. d4 1-0 ) 1... e5 *\n')
+
+
+def test_several_games():
+    assert_same(
+        HEADERS
+        + '[Result "*"]\n\n1. e4 e5 1-0\n\n'
+        + HEADERS
+        + "\n1. d4 d5 1/2-1/2\n\n"
+        + HEADERS
+        + '[Result "0-1"]\n\n1. c4 *\n'
+    )